@@ -1,6 +1,7 @@
 # migrate_slack_integration.py
 from app import create_app, db
-from models import NotificationChannel
+from models import NotificationChannel, User
+from sqlalchemy import inspect, text
 
 def migrate_slack_integration():
     """Ensure notification_channels table exists"""
@@ -24,5 +25,61 @@ def migrate_slack_integration():
         except Exception as e:
             print(f"❌ Error setting up Slack integration: {e}")
 
+def add_missing_columns(table_name, columns):
+    """Add columns (name -> SQL type) that an existing table doesn't have yet"""
+    existing = [column['name'] for column in inspect(db.engine).get_columns(table_name)]
+    for name, sql_type in columns.items():
+        if name not in existing:
+            db.session.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {name} {sql_type}'))
+            print(f"✅ Added {table_name}.{name} column")
+
+def migrate_send_slot_index():
+    """Add the users.next_send_at send-slot index and backfill it"""
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Setting up send-slot index...")
+        
+        try:
+            add_missing_columns('users', {'next_send_at': 'DATETIME'})
+            db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_users_next_send_at ON users (next_send_at)'))
+            
+            users = User.query.filter_by(is_active=True).all()
+            for user in users:
+                user.refresh_next_send_at()
+            db.session.commit()
+            
+            print(f"🎉 Send slots computed for {len(users)} active users")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error setting up send-slot index: {e}")
+
+def migrate_digest_cache():
+    """Add the digest cache and summary columns to news_articles"""
+    app = create_app()
+    
+    with app.app_context():
+        print("🔄 Setting up digest cache...")
+        
+        try:
+            add_missing_columns('news_articles', {
+                'summary': 'TEXT',
+                'summary_tokens': 'INTEGER',
+                'extraction_status': 'VARCHAR(20)',
+                'digest_key': 'VARCHAR(20)',
+                'digest_rank': 'INTEGER'
+            })
+            db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_news_articles_digest_key ON news_articles (digest_key)'))
+            db.session.commit()
+            
+            print("🎉 Digest cache setup complete!")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error setting up digest cache: {e}")
+
 if __name__ == '__main__':
     migrate_slack_integration()
+    migrate_send_slot_index()
+    migrate_digest_cache()
@@ -27,6 +27,8 @@ def create_app():
     app.config['MAIL_USE_TLS'] = True
     app.config['MAIL_USERNAME'] = os.environ.get('EMAIL_USER')
     app.config['MAIL_PASSWORD'] = os.environ.get('EMAIL_PASS')
+    app.config['MAIL_POOL_SIZE'] = int(os.environ.get('MAIL_POOL_SIZE', 3))  # Persistent SMTP connections
+    app.config['MAIL_POOL_MAX_PER_CONNECTION'] = int(os.environ.get('MAIL_POOL_MAX_PER_CONNECTION', 100))
     
     # Initialize extensions with app
     db.init_app(app)
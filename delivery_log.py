@@ -0,0 +1,90 @@
+# delivery_log.py - Chunked bookkeeping for delivery outcomes
+import os
+from datetime import datetime
+
+FLUSH_CHUNK_SIZE = int(os.environ.get('DELIVERY_FLUSH_CHUNK', 500))
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class DeliveryRecorder:
+    """Collect EmailLog rows and sent markers during a send slot, then write them in chunks.
+
+    Each chunk is one bulk INSERT of email logs, the UPDATE ... WHERE id IN (...)
+    sent markers and moved slots of those same users, and a single commit, so a
+    user's log and schedule never disagree; no more ORM objects and a commit per
+    user.
+    """
+
+    def __init__(self, chunk_size=FLUSH_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.email_logs = []
+        self.sent_users = []
+        self.sent_channel_ids = []
+
+    def record_email(self, user, articles_count, error=None, delivery_time_scheduled=None):
+        self.email_logs.append({
+            'user_id': user.id,
+            'articles_count': articles_count,
+            'status': 'failed' if error else 'sent',
+            'error_message': error,
+            'delivery_time_scheduled': delivery_time_scheduled,
+            'user_timezone': user.timezone
+        })
+        if not error:
+            self.sent_users.append(user)
+
+    def record_channel_sent(self, channel_id):
+        self.sent_channel_ids.append(channel_id)
+
+    def flush(self, sent_at=None):
+        """Write everything recorded so far; returns the number of commits"""
+        from models import User, EmailLog, NotificationChannel
+        from app import db
+
+        sent_at = sent_at or datetime.utcnow()
+        commits = 0
+
+        # Read everything needed from the User objects up front; commits expire them
+        moved_slots = {}
+        for user in self.sent_users:
+            # Only weekly/monthly slots move once the send is recorded
+            next_send_at = user.compute_next_send_at(sent_at, last_email_sent=sent_at)
+            if next_send_at != user.next_send_at:
+                moved_slots[user.id] = {'id': user.id, 'next_send_at': next_send_at}
+
+        # A user's log, sent marker and moved slot always land in the same commit
+        log_chunks = list(chunked(self.email_logs, self.chunk_size))
+        channel_chunks = list(chunked(self.sent_channel_ids, self.chunk_size))
+        for index in range(max(len(log_chunks), len(channel_chunks))):
+            if index < len(log_chunks):
+                chunk = log_chunks[index]
+                for row in chunk:
+                    row['email_sent_at'] = sent_at
+                db.session.bulk_insert_mappings(EmailLog, chunk)
+
+                chunk_user_ids = [row['user_id'] for row in chunk if row['status'] == 'sent']
+                if chunk_user_ids:
+                    db.session.execute(
+                        db.update(User).where(User.id.in_(chunk_user_ids)).values(last_email_sent=sent_at),
+                        execution_options={'synchronize_session': False}
+                    )
+                chunk_slots = [moved_slots[user_id] for user_id in chunk_user_ids if user_id in moved_slots]
+                if chunk_slots:
+                    db.session.bulk_update_mappings(User, chunk_slots)
+
+            if index < len(channel_chunks):
+                db.session.execute(
+                    db.update(NotificationChannel).where(NotificationChannel.id.in_(channel_chunks[index]))
+                    .values(last_sent_at=sent_at),
+                    execution_options={'synchronize_session': False}
+                )
+
+            db.session.commit()
+            commits += 1
+
+        print(f"💾 Recorded {len(self.email_logs)} email logs, {len(self.sent_users)} sent users and "
+              f"{len(self.sent_channel_ids)} channels in {commits} commits")
+        self.email_logs, self.sent_users, self.sent_channel_ids = [], [], []
+        return commits
@@ -0,0 +1,228 @@
+# delivery_queue.py - Durable outbound delivery queue and worker processes
+import os
+import json
+import time
+import socket
+import multiprocessing
+from datetime import datetime, timedelta
+
+LEASE_SECONDS = int(os.environ.get('DELIVERY_LEASE_SECONDS', 300))
+CLAIM_BATCH_SIZE = int(os.environ.get('DELIVERY_BATCH_SIZE', 50))
+POLL_INTERVAL = float(os.environ.get('DELIVERY_POLL_INTERVAL', 2))
+RETRY_BASE_SECONDS = 60
+
+def queue_mode_enabled():
+    """Whether the scheduler should enqueue deliveries instead of sending inline"""
+    return os.environ.get('DELIVERY_MODE', 'inline').lower() == 'queue'
+
+def enqueue_deliveries(users, news_articles, scheduled_slots=None):
+    """Add one delivery job per (user, channel); the caller commits.
+
+    news_articles is either one shared digest or a {user_id: articles} mapping
+    of personalized digests.
+    """
+    from models import DeliveryJob
+    from app import db
+
+    scheduled_slots = scheduled_slots or {}
+    jobs = []
+    for user in users:
+        if isinstance(news_articles, dict):
+            user_articles = news_articles.get(user.id, [])
+        else:
+            user_articles = news_articles[:user.max_articles]
+        payload = json.dumps(user_articles)
+        jobs.append(DeliveryJob(
+            user_id=user.id,
+            channel='email',
+            payload=payload,
+            delivery_time_scheduled=scheduled_slots.get(user.id)
+        ))
+        for channel in getattr(user, 'notification_channels', None) or []:
+            if channel.is_active and channel.channel_type == 'slack' and channel.webhook_url:
+                jobs.append(DeliveryJob(
+                    user_id=user.id,
+                    channel='slack',
+                    channel_id=channel.id,
+                    payload=payload,
+                    delivery_time_scheduled=scheduled_slots.get(user.id)
+                ))
+
+    db.session.add_all(jobs)
+    print(f"📥 Enqueued {len(jobs)} delivery jobs for {len(users)} users")
+    return jobs
+
+def claim_jobs(worker_id, limit=CLAIM_BATCH_SIZE, lease_seconds=LEASE_SECONDS):
+    """Lease up to `limit` runnable jobs for this worker.
+
+    Jobs whose lease expired (their worker died or stalled) are first put back
+    with the lost run counted as an attempt, so a job that keeps killing its
+    worker eventually fails instead of being retried forever. The lease is
+    taken with a conditional UPDATE so two workers racing for the same rows can
+    never both win them.
+    """
+    from models import DeliveryJob
+    from app import db
+
+    now = datetime.utcnow()
+    expired = DeliveryJob.query.filter(DeliveryJob.status == 'leased', DeliveryJob.leased_until < now).all()
+    if expired:
+        # The lease itself already delayed the retry, so these are runnable again right away
+        email_logs = [complete_job(job, 'Delivery lease expired before the job completed', job.lease_owner, retry_delay=0)
+                      for job in expired]
+        db.session.add_all([log for log in email_logs if log])
+        db.session.commit()
+        now = datetime.utcnow()
+
+    runnable = db.and_(DeliveryJob.status == 'pending', DeliveryJob.available_at <= now)
+
+    candidate_ids = [row.id for row in db.session.query(DeliveryJob.id)
+                     .filter(runnable).order_by(DeliveryJob.available_at).limit(limit)]
+    if not candidate_ids:
+        return []
+
+    DeliveryJob.query.filter(DeliveryJob.id.in_(candidate_ids), runnable).update({
+        'status': 'leased',
+        'lease_owner': worker_id,
+        'leased_until': now + timedelta(seconds=lease_seconds)
+    }, synchronize_session=False)
+    db.session.commit()
+
+    return DeliveryJob.query.filter(
+        DeliveryJob.id.in_(candidate_ids),
+        DeliveryJob.status == 'leased',
+        DeliveryJob.lease_owner == worker_id
+    ).all()
+
+def complete_job(job, error=None, worker_id=None, retry_delay=None):
+    """Mark a job done, or schedule a retry with backoff until attempts run out.
+
+    Only the worker still holding the lease may complete the job; the lease is
+    released with a conditional UPDATE, and a completion from a worker whose
+    lease expired (and was possibly reclaimed) is dropped and returns None.
+    """
+    from models import DeliveryJob, EmailLog
+
+    released = DeliveryJob.query.filter(
+        DeliveryJob.id == job.id,
+        DeliveryJob.status == 'leased',
+        DeliveryJob.lease_owner == (worker_id or job.lease_owner)
+    ).update({'lease_owner': None, 'leased_until': None}, synchronize_session=False)
+    if not released:
+        print(f"⚠️  {job.channel} job {job.id} lease lost before completion, dropping the stale result")
+        return None
+
+    now = datetime.utcnow()
+    job.attempts += 1
+    job.lease_owner = None
+    job.leased_until = None
+
+    if error and job.attempts < job.max_attempts:
+        job.status = 'pending'
+        job.last_error = error
+        if retry_delay is None:
+            retry_delay = RETRY_BASE_SECONDS * 2 ** (job.attempts - 1)
+        job.available_at = now + timedelta(seconds=retry_delay)
+        print(f"🔁 {job.channel} job {job.id} failed ({error}), retry {job.attempts}/{job.max_attempts - 1}")
+        return None
+
+    job.status = 'failed' if error else 'done'
+    job.last_error = error
+    job.completed_at = now
+
+    if job.channel == 'email':
+        user = job.user
+        if not error:
+            user.last_email_sent = now
+            user.refresh_next_send_at()
+        return EmailLog(
+            user_id=job.user_id,
+            articles_count=len(job.get_articles()),
+            status='failed' if error else 'sent',
+            error_message=error,
+            delivery_time_scheduled=job.delivery_time_scheduled,
+            user_timezone=user.timezone
+        )
+
+    if job.channel == 'slack' and not error and job.notification_channel:
+        job.notification_channel.last_sent_at = now
+    return None
+
+def process_jobs(app, jobs, worker_id=None):
+    """Deliver a batch of leased jobs and record the outcomes this worker still holds leases for"""
+    from app import db
+    from email_service import PooledEmailSender, queue_news_email, delivery_error
+    from notification_service import NotificationService
+
+    email_jobs = [job for job in jobs if job.channel == 'email']
+    slack_jobs = [job for job in jobs if job.channel == 'slack']
+    outcomes = []
+
+    if email_jobs:
+        with PooledEmailSender(app) as email_sender:
+            futures = [(job, queue_news_email(job.user.email, job.get_articles(), email_sender))
+                       for job in email_jobs]
+        outcomes.extend((job, delivery_error(future)) for job, future in futures)
+
+    if slack_jobs:
+        notification_service = NotificationService()
+        deliveries = []
+        for job in slack_jobs:
+            channel = job.notification_channel
+            if not channel or not channel.is_active or not channel.webhook_url:
+                outcomes.append((job, 'Notification channel no longer active'))
+                continue
+            deliveries.append((job.id, channel.webhook_url,
+                               notification_service.encode_slack_payload(job.get_articles(), job.user.email)))
+        results = notification_service.dispatcher.dispatch(deliveries)
+        outcomes.extend((job, results[job.id]['error'] or (None if results[job.id]['sent'] else 'Slack delivery failed'))
+                        for job in slack_jobs if job.id in results)
+
+    email_logs = [log for log in (complete_job(job, error, worker_id) for job, error in outcomes) if log]
+    db.session.add_all(email_logs)
+    db.session.commit()
+
+    delivered = len([1 for _, error in outcomes if not error])
+    print(f"📦 Worker batch: {delivered}/{len(outcomes)} delivered")
+    return outcomes
+
+def run_worker(app=None, worker_id=None, stop_when_empty=False):
+    """Drain the delivery queue until interrupted (or until it is empty)"""
+    if app is None:
+        from app import create_app
+        app = create_app()
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+    print(f"👷 Delivery worker {worker_id} started")
+    with app.app_context():
+        from app import db
+        while True:
+            try:
+                jobs = claim_jobs(worker_id)
+                if jobs:
+                    process_jobs(app, jobs, worker_id)
+                    continue
+                if stop_when_empty:
+                    break
+            except Exception as e:
+                print(f"❌ Delivery worker {worker_id} error: {e}")
+                db.session.rollback()
+            time.sleep(POLL_INTERVAL)
+    print(f"👋 Delivery worker {worker_id} stopped")
+
+def start_workers(processes=2):
+    """Run N delivery worker processes and wait for them"""
+    workers = [
+        multiprocessing.Process(target=run_worker, name=f'delivery-worker-{i}')
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    print(f"🚀 Started {processes} delivery worker processes")
+
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
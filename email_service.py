@@ -1,58 +1,244 @@
 # email_service.py - Updated to include current_date
 from flask import render_template
 from flask_mail import Message
+from markupsafe import escape
 from app import mail
+from collections import OrderedDict
+from concurrent.futures import Future
+import queue
+import smtplib
 import threading
+import time
 from datetime import datetime
 
-def send_async_email(app, msg):
-    """Send email asynchronously"""
-    with app.app_context():
+# Placeholder rendered in place of the recipient, substituted per user
+USER_EMAIL_PLACEHOLDER = '__DIGEST_USER_EMAIL__'
+DIGEST_RENDER_CACHE_SIZE = 32
+# Every article field email_template.html reads; all of them belong in the render cache key
+DIGEST_TEMPLATE_FIELDS = ('url', 'title', 'description', 'summary', 'ai_summary', 'source', 'published_at', 'topic_name')
+
+_digest_render_cache = OrderedDict()
+_digest_render_lock = threading.Lock()
+
+def _digest_cache_key(news_articles, current_date):
+    """Identify an article set (and therefore its max_articles slice) for one day"""
+    return (current_date, tuple(
+        tuple(article.get(field) for field in DIGEST_TEMPLATE_FIELDS)
+        for article in news_articles
+    ))
+
+def render_digest_html(user_email, news_articles, current_date=None):
+    """Render the digest template once per article set and personalize it with cheap substitution"""
+    current_date = current_date or datetime.now().strftime('%A, %B %d, %Y')
+    key = _digest_cache_key(news_articles, current_date)
+    
+    with _digest_render_lock:
+        html = _digest_render_cache.get(key)
+        if html is not None:
+            _digest_render_cache.move_to_end(key)
+    
+    if html is None:
+        html = render_template('email_template.html', 
+                               articles=news_articles, 
+                               user_email=USER_EMAIL_PLACEHOLDER,
+                               current_date=current_date,
+                               preview=False)
+        with _digest_render_lock:
+            _digest_render_cache[key] = html
+            while len(_digest_render_cache) > DIGEST_RENDER_CACHE_SIZE:
+                _digest_render_cache.popitem(last=False)
+    
+    return html.replace(USER_EMAIL_PLACEHOLDER, str(escape(user_email)))
+
+class PooledEmailSender:
+    """Bounded pool of worker threads, each holding one long-lived SMTP connection.
+    
+    Messages submitted to the pool are spread over a few persistent sessions
+    opened with mail.connect(). A connection is recycled after
+    max_per_connection messages and reopened (with one retry of the message)
+    when the server drops it. submit() returns a Future that resolves to True once
+    the server accepted the message, or raises the delivery error.
+    """
+    
+    def __init__(self, app, connections=None, max_per_connection=None):
+        self.app = app
+        self.connections = connections or app.config.get('MAIL_POOL_SIZE', 3)
+        self.max_per_connection = max_per_connection or app.config.get('MAIL_POOL_MAX_PER_CONNECTION', 100)
+        self.sent = 0
+        self.failed = 0
+        self.reconnects = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+        self._started_at = None
+        self._finished_at = None
+    
+    def start(self):
+        """Start the worker threads"""
+        self._started_at = time.perf_counter()
+        for i in range(self.connections):
+            worker = threading.Thread(target=self._run, name=f'smtp-sender-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        return self
+    
+    def submit(self, msg):
+        """Queue a message for delivery"""
+        future = Future()
+        self._queue.put((msg, future))
+        return future
+    
+    def close(self):
+        """Wait for queued messages to be delivered and close every connection"""
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+        self._finished_at = time.perf_counter()
+        return self.stats()
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+    
+    def stats(self):
+        """Delivery counters and throughput for this pool"""
+        elapsed = ((self._finished_at or time.perf_counter()) - self._started_at) if self._started_at else 0
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'reconnects': self.reconnects,
+            'connections': self.connections,
+            'elapsed_seconds': round(elapsed, 3),
+            'messages_per_second': round(self.sent / elapsed, 1) if elapsed else 0.0
+        }
+    
+    def _open(self):
+        connection = mail.connect()
+        connection.__enter__()
+        return connection
+    
+    def _close(self, connection):
         try:
-            mail.send(msg)
-            return True
-        except Exception as e:
-            print(f"❌ Error sending email: {e}")
-            return False
+            connection.__exit__(None, None, None)
+        except Exception:
+            pass  # Server already dropped the session
+    
+    def _reset(self, connection):
+        if connection:
+            self._close(connection)
+        with self._lock:
+            self.reconnects += 1
+        return None
+    
+    def _run(self):
+        with self.app.app_context():
+            connection = None
+            sent_on_connection = 0
+            
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                msg, future = item
+                
+                # Recycle the session once it reaches its message cap
+                if connection and sent_on_connection >= self.max_per_connection:
+                    self._close(connection)
+                    connection = None
+                
+                delivered = False
+                error = None
+                for attempt in range(2):
+                    try:
+                        if connection is None:
+                            connection = self._open()
+                            sent_on_connection = 0
+                        connection.send(msg)
+                        sent_on_connection += 1
+                        delivered = True
+                        break
+                    except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
+                        # Connection-level failure: reconnect and retry once
+                        print(f"⚠️  SMTP connection lost ({e}), reconnecting...")
+                        error = e
+                        connection = self._reset(connection)
+                    except smtplib.SMTPException as e:
+                        # Rejected by the server (recipient, data, auth) - retrying won't help
+                        print(f"❌ Error sending email to {', '.join(msg.recipients)}: {e}")
+                        error = e
+                        break
+                    except OSError as e:
+                        print(f"⚠️  SMTP socket error ({e}), reconnecting...")
+                        error = e
+                        connection = self._reset(connection)
+                    except Exception as e:
+                        print(f"❌ Error sending email to {', '.join(msg.recipients)}: {e}")
+                        error = e
+                        break
+                
+                with self._lock:
+                    if delivered:
+                        self.sent += 1
+                    else:
+                        self.failed += 1
+                
+                # The real outcome goes back to whoever queued the message
+                if delivered:
+                    future.set_result(True)
+                else:
+                    future.set_exception(error)
+            
+            if connection:
+                self._close(connection)
+
+def build_news_email(user_email, news_articles):
+    """Build the daily AI news message for one recipient"""
+    from flask import current_app
+    
+    msg = Message(
+        subject='🤖 Your Daily AI News Update - AI-Powered Summaries Inside!',
+        sender=current_app.config['MAIL_USERNAME'],
+        recipients=[user_email]
+    )
+    
+    # Use enhanced template with summaries, rendered once per article set
+    msg.html = render_digest_html(user_email, news_articles)
+    
+    return msg
 
-def send_news_email(user_email, news_articles):
-    """Send daily AI news email to user with Gemini summaries"""
+def queue_news_email(user_email, news_articles, sender):
+    """Queue a digest on a PooledEmailSender.
+    
+    Returns a Future carrying the real delivery outcome; problems preparing the
+    message (e.g. email not configured) come back as an already-failed Future.
+    """
     try:
         from flask import current_app
         
         if not current_app.config.get('MAIL_USERNAME'):
-            print("⚠️  Email not configured, skipping send")
-            return False
-        
-        msg = Message(
-            subject='🤖 Your Daily AI News Update - AI-Powered Summaries Inside!',
-            sender=current_app.config['MAIL_USERNAME'],
-            recipients=[user_email]
-        )
+            raise RuntimeError("Email not configured")
         
-        # Get current date in a nice format
-        current_date = datetime.now().strftime('%A, %B %d, %Y')
-        
-        # Use enhanced template with summaries
-        msg.html = render_template('email_template.html', 
-                                 articles=news_articles, 
-                                 user_email=user_email,
-                                 current_date=current_date,
-                                 preview=False)
-        
-        # Send email in background thread
-        thread = threading.Thread(
-            target=send_async_email, 
-            args=(current_app._get_current_object(), msg)
-        )
-        thread.start()
-        
-        print(f"📧 Email with {len(news_articles)} AI-summarized articles sent to {user_email}")
-        return True
+        future = sender.submit(build_news_email(user_email, news_articles))
+        print(f"📧 Email with {len(news_articles)} AI-summarized articles queued for {user_email}")
+        return future
         
     except Exception as e:
         print(f"❌ Error preparing email for {user_email}: {e}")
-        return False
+        future = Future()
+        future.set_exception(e)
+        return future
+
+def delivery_error(future):
+    """Wait for a queued email and return its error message, or None if delivered"""
+    try:
+        future.result()
+        return None
+    except Exception as e:
+        return str(e) or e.__class__.__name__
 
 def test_email_config():
     """Test email configuration"""
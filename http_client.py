@@ -0,0 +1,121 @@
+# http_client.py - Shared process-wide HTTP session with pooled keep-alive connections
+import os
+import threading
+from collections import defaultdict
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+POOL_CONNECTIONS = int(os.environ.get('HTTP_POOL_CONNECTIONS', 50))  # Hosts with a cached pool
+POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 32))  # Keep-alive connections kept per host
+RETRIES = int(os.environ.get('HTTP_RETRIES', 2))
+RETRY_BACKOFF = float(os.environ.get('HTTP_RETRY_BACKOFF', 0.5))
+RETRY_STATUSES = (500, 502, 503, 504)
+
+class ConnectionStats:
+    """Requests and newly opened connections per host; the difference is keep-alive reuse"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = defaultdict(lambda: {'requests': 0, 'connections': 0, 'errors': 0})
+
+    def record_connection(self, host):
+        with self._lock:
+            self._hosts[host]['connections'] += 1
+
+    def record_response(self, host, status_code):
+        with self._lock:
+            self._hosts[host]['requests'] += 1
+            if status_code >= 400:
+                self._hosts[host]['errors'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            hosts = {host: dict(counts) for host, counts in self._hosts.items()}
+        for counts in hosts.values():
+            counts['reused'] = max(counts['requests'] - counts['connections'], 0)
+        requests_total = sum(counts['requests'] for counts in hosts.values())
+        connections_total = sum(counts['connections'] for counts in hosts.values())
+        return {
+            'requests': requests_total,
+            'connections': connections_total,
+            'reuse_rate': round(1 - connections_total / requests_total, 3) if requests_total else 0.0,
+            'pool_connections': POOL_CONNECTIONS,
+            'pool_maxsize': POOL_MAXSIZE,
+            'retries': RETRIES,
+            'hosts': hosts
+        }
+
+connection_stats = ConnectionStats()
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        connection_stats.record_connection(self.host)
+        return super()._new_conn()
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        connection_stats.record_connection(self.host)
+        return super()._new_conn()
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose urllib3 pools report every new connection they open"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool
+        }
+
+def build_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, retries=RETRIES):
+    """Session with per-host keep-alive pools and retry-with-backoff.
+
+    Idempotent requests are retried on connection errors and 5xx responses,
+    honoring Retry-After; POSTs are only retried when the connection could not
+    be opened, so a webhook is never delivered twice.
+    """
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(('GET', 'HEAD', 'OPTIONS')),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = PooledHTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = 'AI-News-Digest/1.0'
+    # Calls to unrelated sites share the session, so never carry cookies between them
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    session.hooks['response'].append(_record_response)
+    return session
+
+def _record_response(response, *args, **kwargs):
+    connection_stats.record_response(urlparse(response.url).hostname or '', response.status_code)
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """The process-wide session; forked worker processes get their own"""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = build_session()
+            _session_pid = os.getpid()
+        return _session
+
+def http_stats():
+    """Connection reuse counters for /api/cache-stats"""
+    return connection_stats.snapshot()
@@ -1,9 +1,12 @@
 # models.py
 from app import db
-from datetime import datetime, time
-import pytz
+from sqlalchemy.orm import selectinload
+from datetime import datetime, time, timedelta
 import json
 
+# Days between deliveries for each supported frequency
+FREQUENCY_DAYS = {'daily': 1, 'weekly': 7, 'monthly': 30}
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -19,12 +22,20 @@ class User(db.Model):
     frequency = db.Column(db.String(20), default='daily')  # daily, weekly, monthly
     max_articles = db.Column(db.Integer, default=5)  # Max articles per email
     
+    # Precomputed send-slot index: next delivery instant in naive UTC
+    next_send_at = db.Column(db.DateTime, index=True)
+    
     # Relationships
     preferences = db.relationship('UserPreference', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f"User('{self.email}', active={self.is_active})"
     
+    @classmethod
+    def query_with_preferences(cls):
+        """User query that loads preferences and their topics up front (no per-row lazy loads)"""
+        return cls.query.options(selectinload(cls.preferences).joinedload(UserPreference.topic))
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -36,6 +47,7 @@ class User(db.Model):
             'timezone': self.timezone,
             'frequency': self.frequency,
             'max_articles': self.max_articles,
+            'next_send_at': self.next_send_at.isoformat() if self.next_send_at else None,
             'preferences': [pref.to_dict() for pref in self.preferences]
         }
     
@@ -65,6 +77,30 @@ class User(db.Model):
             return days_since_last >= 30
         
         return False
+    
+    def compute_next_send_at(self, after=None, last_email_sent=None):
+        """Compute the next UTC send slot from preferred time, timezone and frequency.
+        
+        last_email_sent overrides the stored value, e.g. for a send not yet written back.
+        """
+        from timezones import zone_table
+        
+        after = after or datetime.utcnow()
+        last_email_sent = last_email_sent or self.last_email_sent
+        
+        # Respect frequency: the next slot can't come before last send + interval
+        earliest_date = None
+        if last_email_sent:
+            interval = FREQUENCY_DAYS.get(self.frequency, 1)
+            earliest_date = zone_table.local_date(self.timezone, last_email_sent) + timedelta(days=interval)
+        
+        # Zones, local dates and slots are shared by every user with the same settings
+        return zone_table.next_slot(self.timezone, self.preferred_time or time(10, 0), after, earliest_date)
+    
+    def refresh_next_send_at(self, after=None):
+        """Recompute and store the send-slot index for this user"""
+        self.next_send_at = self.compute_next_send_at(after)
+        return self.next_send_at
 
 class Topic(db.Model):
     __tablename__ = 'topics'
@@ -84,7 +120,23 @@ class Topic(db.Model):
     def __repr__(self):
         return f"Topic('{self.name}')"
     
-    def to_dict(self):
+    @classmethod
+    def active_with_subscriber_counts(cls):
+        """Active topics paired with their active-subscriber count, in a single query"""
+        counts = db.session.query(
+            UserPreference.topic_id,
+            db.func.count(UserPreference.id).label('subscriber_count')
+        ).filter(UserPreference.is_active == True).group_by(UserPreference.topic_id).subquery()
+        
+        return db.session.query(cls, db.func.coalesce(counts.c.subscriber_count, 0))\
+            .outerjoin(counts, counts.c.topic_id == cls.id)\
+            .filter(cls.is_active == True).order_by(cls.id).all()
+    
+    def to_dict(self, subscriber_count=None):
+        if subscriber_count is None:
+            # COUNT in the database instead of loading every preference row
+            subscriber_count = UserPreference.query.filter_by(topic_id=self.id, is_active=True).count()
+        
         return {
             'id': self.id,
             'name': self.name,
@@ -92,7 +144,7 @@ class Topic(db.Model):
             'keywords': self.keywords.split(',') if self.keywords else [],
             'icon': self.icon,
             'is_active': self.is_active,
-            'subscriber_count': len([p for p in self.preferences if p.is_active])
+            'subscriber_count': subscriber_count
         }
 
 class UserPreference(db.Model):
@@ -112,12 +164,13 @@ class UserPreference(db.Model):
         return f"UserPreference(user={self.user_id}, topic={self.topic_id})"
     
     def to_dict(self):
+        topic = self.topic
         return {
             'id': self.id,
             'user_id': self.user_id,
             'topic_id': self.topic_id,
-            'topic_name': self.topic.name if self.topic else None,
-            'topic_icon': self.topic.icon if self.topic else None,
+            'topic_name': topic.name if topic else None,
+            'topic_icon': topic.icon if topic else None,
             'is_active': self.is_active,
             'priority': self.priority,
             'created_at': self.created_at.isoformat() if self.created_at else None
@@ -139,9 +192,34 @@ class NewsArticle(db.Model):
     topic_id = db.Column(db.Integer, db.ForeignKey('topics.id'), nullable=True)
     relevance_score = db.Column(db.Float, default=0.0)
     
+    # Gemini summary stored alongside the article
+    summary = db.Column(db.Text)
+    summary_tokens = db.Column(db.Integer, default=0)
+    extraction_status = db.Column(db.String(20))
+    
+    # Digest cache: which day's digest this article belongs to and its position in it
+    digest_key = db.Column(db.String(20), index=True)
+    digest_rank = db.Column(db.Integer)
+    
     def __repr__(self):
         return f"NewsArticle('{self.title[:50]}...')"
     
+    def to_digest_dict(self):
+        """Article in the same shape NewsService.fetch_ai_news returns"""
+        return {
+            'title': self.title,
+            'url': self.url,
+            'description': self.description,
+            'source': self.source,
+            'published_at': self.published_at.isoformat() if self.published_at else None,
+            'summary': self.summary,
+            'summary_tokens': self.summary_tokens or 0,
+            'extraction_status': self.extraction_status,
+            'topic_id': self.topic_id,
+            'topic_name': self.topic.name if self.topic else None,
+            'relevance_score': self.relevance_score or 0.0
+        }
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -154,7 +232,9 @@ class NewsArticle(db.Model):
             'topic_name': self.topic.name if self.topic else self.category,
             'topic_id': self.topic_id,
             'category': self.category,
-            'relevance_score': self.relevance_score
+            'relevance_score': self.relevance_score,
+            'summary': self.summary,
+            'extraction_status': self.extraction_status
         }
 
 class EmailLog(db.Model):
@@ -293,3 +373,152 @@ class NotificationChannel(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'last_sent_at': self.last_sent_at.isoformat() if self.last_sent_at else None
         }
+
+
+class DeliveryJob(db.Model):
+    __tablename__ = 'delivery_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    channel = db.Column(db.String(20), nullable=False)  # email, slack
+    channel_id = db.Column(db.Integer, db.ForeignKey('notification_channels.id'))  # For slack jobs
+    payload = db.Column(db.Text, nullable=False)  # JSON list of articles for this recipient
+    
+    # Queue state: pending -> leased -> done / failed
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=3, nullable=False)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    lease_owner = db.Column(db.String(64))
+    leased_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    
+    delivery_time_scheduled = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (db.Index('ix_delivery_jobs_claim', 'status', 'available_at'),)
+    
+    # Relationships
+    user = db.relationship('User', backref=db.backref('delivery_jobs', lazy=True))
+    notification_channel = db.relationship('NotificationChannel')
+    
+    def __repr__(self):
+        return f"DeliveryJob({self.channel}, user={self.user_id}, status='{self.status}')"
+    
+    def get_articles(self):
+        return json.loads(self.payload)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'channel': self.channel,
+            'channel_id': self.channel_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'available_at': self.available_at.isoformat() if self.available_at else None,
+            'lease_owner': self.lease_owner,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+
+class DashboardSummary(db.Model):
+    __tablename__ = 'dashboard_summary'
+    
+    # Single materialized row, refreshed by the scheduler
+    id = db.Column(db.Integer, primary_key=True)
+    total_users = db.Column(db.Integer, default=0, nullable=False)
+    active_users = db.Column(db.Integer, default=0, nullable=False)
+    total_topics = db.Column(db.Integer, default=0, nullable=False)
+    total_articles = db.Column(db.Integer, default=0, nullable=False)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f"DashboardSummary(users={self.total_users}, refreshed_at={self.refreshed_at})"
+
+
+class TopicSubscriberCount(db.Model):
+    __tablename__ = 'topic_subscriber_counts'
+    
+    # Materialized active-subscriber count per topic
+    topic_id = db.Column(db.Integer, db.ForeignKey('topics.id'), primary_key=True)
+    subscriber_count = db.Column(db.Integer, default=0, nullable=False, index=True)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    topic = db.relationship('Topic')
+    
+    def __repr__(self):
+        return f"TopicSubscriberCount(topic={self.topic_id}, count={self.subscriber_count})"
+
+
+class FetchCursor(db.Model):
+    __tablename__ = 'fetch_cursors'
+    
+    # Incremental fetch state per news source
+    source = db.Column(db.String(50), primary_key=True)
+    high_water_mark = db.Column(db.DateTime)  # Newest publishedAt seen so far
+    boundary_urls = db.Column(db.Text)  # JSON list of URLs published exactly at the high-water mark
+    etag = db.Column(db.String(200))
+    last_modified = db.Column(db.String(100))
+    backoff_until = db.Column(db.DateTime)
+    requests_made = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def get_boundary_urls(self):
+        """Parse the boundary URL set from JSON"""
+        return set(json.loads(self.boundary_urls)) if self.boundary_urls else set()
+    
+    def set_boundary_urls(self, urls):
+        """Store the boundary URL set as JSON"""
+        self.boundary_urls = json.dumps(sorted(urls))
+    
+    def __repr__(self):
+        return f"FetchCursor(source={self.source}, high_water_mark={self.high_water_mark})"
+
+
+class ArticleSignature(db.Model):
+    __tablename__ = 'article_signatures'
+    
+    # SimHash of title + description, banded for near-duplicate lookups
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(500), unique=True, nullable=False)
+    canonical_url = db.Column(db.String(500), nullable=False)  # First URL seen for this story
+    simhash = db.Column(db.BigInteger, nullable=False)
+    band0 = db.Column(db.Integer, nullable=False, index=True)
+    band1 = db.Column(db.Integer, nullable=False, index=True)
+    band2 = db.Column(db.Integer, nullable=False, index=True)
+    band3 = db.Column(db.Integer, nullable=False, index=True)
+    band4 = db.Column(db.Integer, nullable=False, index=True)
+    band5 = db.Column(db.Integer, nullable=False, index=True)
+    band6 = db.Column(db.Integer, nullable=False, index=True)
+    band7 = db.Column(db.Integer, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"ArticleSignature(url={self.url}, canonical={self.canonical_url})"
+
+
+class SchedulerShard(db.Model):
+    __tablename__ = 'scheduler_shards'
+    
+    # Lease on one hash range of user ids (user.id % shard count) for the send job
+    shard_id = db.Column(db.Integer, primary_key=True)
+    lease_owner = db.Column(db.String(64), index=True)
+    leased_until = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f"SchedulerShard({self.shard_id}, owner={self.lease_owner})"
+
+
+class SchedulerNode(db.Model):
+    __tablename__ = 'scheduler_nodes'
+    
+    # Heartbeat of each scheduler node; live nodes split the shards evenly
+    node_id = db.Column(db.String(64), primary_key=True)
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"SchedulerNode({self.node_id}, last_seen={self.last_seen})"
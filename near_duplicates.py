@@ -0,0 +1,175 @@
+# near_duplicates.py - SimHash near-duplicate detection for syndicated stories
+import os
+import re
+import hashlib
+from datetime import datetime, timedelta
+from flask import has_app_context
+from summary_cache import url_key
+
+SIMHASH_BITS = 64
+BAND_BITS = 8  # 8 bands: two signatures within 7 bits always share at least one band
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'in', 'is', 'it',
+    'its', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'were', 'will', 'with'
+))
+WORD_RE = re.compile(r'\w+')
+MIN_FEATURES = 3  # Fewer than this says too little about a story to cluster it
+
+def features(text):
+    """Words and word bigrams of the case-folded text in any script, stopwords removed"""
+    words = [word for word in WORD_RE.findall(text.casefold()) if word not in STOPWORDS]
+    return words + [f'{first} {second}' for first, second in zip(words, words[1:])]
+
+def simhash(text):
+    """64-bit SimHash; similar texts differ in only a few bits. None when the text has too few features"""
+    text_features = features(text)
+    if len(text_features) < MIN_FEATURES:
+        return None
+    counts = [0] * SIMHASH_BITS
+    for feature in text_features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            counts[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if counts[bit] > 0)
+
+def hamming_distance(first, second):
+    return bin(first ^ second).count('1')
+
+def signature_bands(signature):
+    return [signature >> shift & ((1 << BAND_BITS) - 1) for shift in range(0, SIMHASH_BITS, BAND_BITS)]
+
+def to_signed(signature):
+    """Store unsigned 64-bit signatures in a signed BIGINT column"""
+    return signature - (1 << SIMHASH_BITS) if signature >= 1 << (SIMHASH_BITS - 1) else signature
+
+def to_unsigned(signature):
+    return signature + (1 << SIMHASH_BITS) if signature < 0 else signature
+
+def article_text(article_data):
+    return f"{article_data.get('title') or ''} {article_data.get('description') or ''}"
+
+class NearDuplicateDetector:
+    """Cluster copies of the same story by SimHash of title plus description.
+
+    Signatures are persisted in ArticleSignature with their 8-bit bands
+    indexed, so a candidate is compared only against stored articles sharing a
+    band (LSH) rather than the whole window. Copies of a story seen in an
+    earlier run are dropped; copies within one batch collapse into the first
+    (newest) one, which carries the other URLs in 'duplicate_urls'. Articles
+    with too little text to fingerprint are passed through and never stored.
+    """
+
+    def __init__(self, max_distance=None, window_days=None):
+        self.max_distance = max_distance if max_distance is not None else int(os.environ.get('NEAR_DUPLICATE_DISTANCE', 6))
+        self.window = timedelta(days=window_days if window_days is not None else int(os.environ.get('NEAR_DUPLICATE_WINDOW_DAYS', 3)))
+
+    def collapse(self, articles):
+        """Representatives of each story, in original order"""
+        if not articles:
+            return articles
+
+        signatures = [simhash(article_text(article_data)) for article_data in articles]
+        # Stored URLs are truncated to the column length, so compare through the same key
+        keys = [url_key(article_data['url']) for article_data in articles]
+        fingerprinted = [(key, signature) for key, signature in zip(keys, signatures) if signature is not None]
+        stored = self._load_similar([url for url, _ in fingerprinted], [signature for _, signature in fingerprinted])
+        stored_urls = {url for url, _, _ in stored}
+
+        representatives = []
+        kept_signatures = []
+        new_signatures = []
+        for article_data, url, signature in zip(articles, keys, signatures):
+            if signature is None:
+                representatives.append(article_data)
+                kept_signatures.append(None)
+                continue
+
+            # Same story as a representative earlier in this batch
+            duplicate_of = next((kept for kept, kept_signature in zip(representatives, kept_signatures)
+                                 if kept_signature is not None and
+                                 hamming_distance(signature, kept_signature) <= self.max_distance), None)
+            if duplicate_of is not None:
+                duplicate_of.setdefault('duplicate_urls', []).append(article_data['url'])
+                if url not in stored_urls:
+                    new_signatures.append((url, url_key(duplicate_of['url']), signature))
+                continue
+
+            # Same story as an article stored by an earlier run under another URL
+            if url not in stored_urls:
+                canonical = next((stored_url for stored_url, canonical_url, stored_signature in stored
+                                  if stored_url == canonical_url and
+                                  hamming_distance(signature, stored_signature) <= self.max_distance), None)
+                if canonical:
+                    new_signatures.append((url, canonical, signature))
+                    continue
+                new_signatures.append((url, url, signature))
+            elif any(stored_url == url and canonical_url != url for stored_url, canonical_url, _ in stored):
+                continue  # Stored earlier as a copy of another story
+
+            representatives.append(article_data)
+            kept_signatures.append(signature)
+
+        self._store(new_signatures)
+        if len(representatives) < len(articles):
+            print(f"🧬 Collapsed {len(articles)} articles into {len(representatives)} distinct stories")
+        return representatives
+
+    def _load_similar(self, urls, signatures):
+        """Stored (url, canonical_url, signature) rows for the candidate URLs or sharing a band with them"""
+        from models import ArticleSignature
+        from app import db
+
+        if not has_app_context() or not signatures:
+            return []
+
+        band_values = list(zip(*[signature_bands(signature) for signature in signatures]))
+        band_columns = [getattr(ArticleSignature, f'band{index}') for index in range(len(band_values))]
+        try:
+            rows = db.session.query(ArticleSignature.url, ArticleSignature.canonical_url, ArticleSignature.simhash).filter(
+                ArticleSignature.created_at >= datetime.utcnow() - self.window,
+                db.or_(ArticleSignature.url.in_(urls),
+                       *[column.in_(set(values)) for column, values in zip(band_columns, band_values)])
+            ).all()
+        except Exception as e:
+            print(f"⚠️  Could not load article signatures: {e}")
+            return []
+        return [(url, canonical_url, to_unsigned(signature)) for url, canonical_url, signature in rows]
+
+    def _store(self, new_signatures, chunk_size=500):
+        """Index new signatures and prune the ones that fell out of the window"""
+        from models import ArticleSignature
+        from app import db
+
+        if not has_app_context():
+            return
+
+        now = datetime.utcnow()
+        rows = []
+        seen = set()
+        for url, canonical_url, signature in new_signatures:
+            if url in seen:
+                continue
+            seen.add(url)
+            bands = {f'band{index}': band for index, band in enumerate(signature_bands(signature))}
+            rows.append(dict(url=url, canonical_url=canonical_url, simhash=to_signed(signature), created_at=now, **bands))
+
+        try:
+            ArticleSignature.query.filter(ArticleSignature.created_at < now - self.window).delete()
+            # A URL indexed concurrently (or outside the lookup window) is skipped, not the whole batch
+            dialect = db.engine.dialect.name
+            if rows and dialect in ('postgresql', 'sqlite'):
+                if dialect == 'postgresql':
+                    from sqlalchemy.dialects.postgresql import insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert
+                for start in range(0, len(rows), chunk_size):
+                    db.session.execute(insert(ArticleSignature.__table__).values(rows[start:start + chunk_size])
+                                       .on_conflict_do_nothing(index_elements=['url']))
+            elif rows:
+                known = {url for url, in db.session.query(ArticleSignature.url)
+                         .filter(ArticleSignature.url.in_([row['url'] for row in rows]))}
+                db.session.add_all([ArticleSignature(**row) for row in rows if row['url'] not in known])
+            db.session.commit()
+        except Exception as e:
+            print(f"❌ Error saving article signatures: {e}")
+            db.session.rollback()
@@ -0,0 +1,194 @@
+# news_fetcher.py - Incremental NewsAPI fetching with a persisted high-water mark
+import os
+from http_client import get_session
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from flask import has_app_context
+
+NEWSAPI_QUERY = 'artificial intelligence OR machine learning OR AI OR "deep learning" OR "neural networks" OR OpenAI OR ChatGPT'
+
+class NewsAPIFetcher:
+    """Pull only articles published since the last run.
+
+    The cursor keeps the newest publishedAt seen plus the URLs published at
+    exactly that instant, so pages are walked newest-first until a known item
+    shows up. Conditional request headers are replayed when the API sends them,
+    and 429s or exhausted rate-limit headers pause fetching until the reset.
+    """
+
+    source = 'newsapi'
+
+    def __init__(self, api_key, base_url="https://newsapi.org/v2/everything"):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.page_size = int(os.environ.get('NEWSAPI_PAGE_SIZE', 20))
+        self.max_pages = int(os.environ.get('NEWSAPI_MAX_PAGES', 3))
+        self.default_backoff = int(os.environ.get('NEWSAPI_BACKOFF_SECONDS', 900))
+        self.lookback = timedelta(days=1)  # Window for the very first run
+        self._cursor = None
+
+    def fetch_new_articles(self):
+        """Raw NewsAPI article dicts published since the cursor, newest first"""
+        cursor = self._load_cursor()
+        now = datetime.utcnow()
+
+        if cursor.backoff_until and cursor.backoff_until > now:
+            print(f"⏳ NewsAPI rate-limited until {cursor.backoff_until.strftime('%H:%M:%S')} UTC, skipping fetch")
+            return []
+
+        high_water_mark = cursor.high_water_mark
+        boundary_urls = cursor.get_boundary_urls()
+        since = high_water_mark or (now - self.lookback)
+
+        new_articles = []
+        complete = False
+        for page in range(1, self.max_pages + 1):
+            # Key in a header so it never shows up in logged request URLs
+            headers = {'X-Api-Key': self.api_key}
+            if page == 1:
+                if cursor.etag:
+                    headers['If-None-Match'] = cursor.etag
+                if cursor.last_modified:
+                    headers['If-Modified-Since'] = cursor.last_modified
+
+            response = get_session().get(self.base_url, params={
+                'q': NEWSAPI_QUERY,
+                'language': 'en',
+                'sortBy': 'publishedAt',
+                'from': since.strftime('%Y-%m-%dT%H:%M:%S'),
+                'pageSize': self.page_size,
+                'page': page
+            }, headers=headers, timeout=15)
+            cursor.requests_made = (cursor.requests_made or 0) + 1
+
+            if response.status_code == 304:
+                print("📭 NewsAPI: not modified since last fetch")
+                complete = True
+                break
+
+            if response.status_code == 429:
+                cursor.backoff_until = now + timedelta(seconds=self._retry_after(response))
+                print(f"⏳ NewsAPI returned 429, backing off until {cursor.backoff_until.strftime('%H:%M:%S')} UTC")
+                break
+
+            response.raise_for_status()
+            self._apply_rate_limit_headers(cursor, response, now)
+
+            if page == 1:
+                cursor.etag = response.headers.get('ETag')
+                cursor.last_modified = response.headers.get('Last-Modified')
+
+            data = response.json()
+            articles = data.get('articles', [])
+            reached_known = False
+            for article in articles:
+                published_at = parse_published_at(article.get('publishedAt'))
+                if high_water_mark and published_at and (
+                        published_at < high_water_mark or
+                        (published_at == high_water_mark and article.get('url') in boundary_urls)):
+                    reached_known = True
+                    break
+                new_articles.append(article)
+
+            if reached_known or len(articles) < self.page_size or \
+                    page * self.page_size >= data.get('totalResults', 0):
+                complete = True
+                break
+            if cursor.backoff_until and cursor.backoff_until > now:
+                break
+        else:
+            # Page budget spent; move on rather than re-walking the same pages every run
+            complete = True
+            print(f"⚠️  NewsAPI page limit ({self.max_pages}) reached before known articles")
+
+        # Only advance after walking back to known items, so an interrupted run leaves no gap
+        if complete and new_articles:
+            self._advance(cursor, new_articles)
+
+        self._save_cursor(cursor)
+        print(f"📡 NewsAPI: {len(new_articles)} new articles since {since.strftime('%Y-%m-%d %H:%M:%S')} UTC")
+        return new_articles
+
+    def _advance(self, cursor, new_articles):
+        """Move the high-water mark to the newest publishedAt fetched"""
+        published = [(parse_published_at(article.get('publishedAt')), article.get('url'))
+                     for article in new_articles]
+        published = [(published_at, url) for published_at, url in published if published_at]
+        if not published:
+            return
+
+        newest = max(published_at for published_at, _ in published)
+        boundary = {url for published_at, url in published if published_at == newest}
+        if newest == cursor.high_water_mark:
+            boundary |= cursor.get_boundary_urls()
+        cursor.high_water_mark = newest
+        cursor.set_boundary_urls(boundary)
+
+    def _retry_after(self, response):
+        """Seconds to wait from Retry-After (delta or HTTP date), else the default backoff"""
+        value = response.headers.get('Retry-After')
+        if value:
+            try:
+                return max(int(value), 1)
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(value)
+                    return max(int((retry_at - datetime.now(timezone.utc)).total_seconds()), 1)
+                except (TypeError, ValueError):
+                    pass
+        return self.default_backoff
+
+    def _apply_rate_limit_headers(self, cursor, response, now):
+        """Pause until the reset time once the remaining quota hits zero"""
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        if remaining is None or not remaining.isdigit() or int(remaining) > 0:
+            cursor.backoff_until = None
+            return
+
+        reset = response.headers.get('X-RateLimit-Reset', '')
+        wait_seconds = self.default_backoff
+        if reset.isdigit():
+            reset = int(reset)
+            # Either an epoch timestamp or seconds until the window resets
+            wait_seconds = reset - int(now.replace(tzinfo=timezone.utc).timestamp()) if reset > 10 ** 9 else reset
+        cursor.backoff_until = now + timedelta(seconds=max(wait_seconds, 1))
+        print(f"⏳ NewsAPI quota exhausted, pausing until {cursor.backoff_until.strftime('%H:%M:%S')} UTC")
+
+    def _load_cursor(self):
+        from models import FetchCursor
+        from app import db
+
+        if has_app_context():
+            cursor = db.session.get(FetchCursor, self.source)
+            if cursor is None:
+                cursor = FetchCursor(source=self.source, requests_made=0)
+                db.session.add(cursor)
+            return cursor
+
+        # No database available; keep the cursor for this process only
+        if self._cursor is None:
+            self._cursor = FetchCursor(source=self.source, requests_made=0)
+        return self._cursor
+
+    def _save_cursor(self, cursor):
+        from app import db
+
+        if not has_app_context():
+            return
+        try:
+            db.session.commit()
+        except Exception as e:
+            print(f"❌ Error saving NewsAPI cursor: {e}")
+            db.session.rollback()
+
+def parse_published_at(published_at):
+    """Parse a NewsAPI ISO-8601 timestamp into naive UTC"""
+    if not published_at:
+        return None
+    try:
+        parsed = datetime.fromisoformat(published_at.replace('Z', '+00:00'))
+        if parsed.tzinfo:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    except ValueError:
+        return None
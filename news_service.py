@@ -1,84 +1,278 @@
 # news_service.py - Updated for Gemini
 import requests
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from flask import has_app_context
+from sqlalchemy.orm import joinedload
 from summarizer import NewsSummarizer
+from news_fetcher import NewsAPIFetcher, parse_published_at
+from news_sources import IngestionEngine, NewsAPISource, FeedSource, feed_urls_from_env
+from near_duplicates import NearDuplicateDetector
+from http_client import get_session
+from stats_service import stats_cache
+from summary_cache import url_key
 
 class NewsService:
     def __init__(self):
         self.api_key = os.environ.get('NEWS_API_KEY')
         self.base_url = "https://newsapi.org/v2/everything"
         self.summarizer = NewsSummarizer()
+        self.digest_ttl = timedelta(hours=int(os.environ.get('DIGEST_TTL_HOURS', 6)))
+        self.pool_size = int(os.environ.get('DIGEST_POOL_SIZE', 15))  # Articles per digest that cohorts rank from
+        self.max_articles = self.pool_size  # Final articles per digest, raised to the largest user limit
+        self.max_workers = int(os.environ.get('NEWS_FETCH_WORKERS', 4))
+        self.fetcher = NewsAPIFetcher(self.api_key, self.base_url)
+        self.candidate_pool = self.max_articles + 3  # Candidates to extract, since some might fail
+        self.feed_urls = feed_urls_from_env()
+    
+    def get_cached_digest(self, include_summaries=True):
+        """Return today's digest from NewsArticle, fetching and summarizing only when missing or stale"""
+        from models import NewsArticle
+        
+        digest_key = datetime.utcnow().strftime('%Y-%m-%d')
+        cached_articles = NewsArticle.query.options(joinedload(NewsArticle.topic))\
+            .filter_by(digest_key=digest_key).order_by(NewsArticle.digest_rank).all()
+        
+        if cached_articles:
+            fetched_at = max(article.date_fetched for article in cached_articles)
+            if datetime.utcnow() - fetched_at < self.digest_ttl:
+                print(f"🗃️  Using cached digest {digest_key} ({len(cached_articles)} articles)")
+                return [article.to_digest_dict() for article in cached_articles]
+            print(f"♻️  Cached digest {digest_key} is stale, refreshing...")
+        
+        news_data = self.fetch_ai_news(include_summaries=include_summaries)
+        
+        # Only real API results are cached; fallbacks are retried on the next tick
+        if news_data and any(article.get('extraction_status') != 'fallback' for article in news_data):
+            self._store_digest(digest_key, news_data)
+        
+        return news_data
+    
+    def _store_digest(self, digest_key, news_data):
+        """Persist a fetched digest into NewsArticle under the given key"""
+        from models import NewsArticle
+        from app import db
+        
+        try:
+            # Detach articles from the previous version of this digest
+            NewsArticle.query.filter_by(digest_key=digest_key).update({'digest_key': None})
+            
+            now = datetime.utcnow()
+            self._upsert_articles([
+                self._article_row(article_data, now, digest_key=digest_key, digest_rank=rank)
+                for rank, article_data in enumerate(news_data)
+            ])
+            
+            db.session.commit()
+            # The Core upsert bypasses the ORM write hooks that invalidate /api/stats
+            stats_cache.invalidate()
+            print(f"💾 Cached digest {digest_key} with {len(news_data)} articles")
+        
+        except Exception as e:
+            print(f"❌ Error caching digest {digest_key}: {e}")
+            db.session.rollback()
+    
+    def ingest_articles(self, articles):
+        """Bulk-upsert fetched articles (with any summary and extraction status) into NewsArticle"""
+        from app import db
+        
+        if not articles or not has_app_context():
+            return
+        
+        try:
+            now = datetime.utcnow()
+            self._upsert_articles([self._article_row(article_data, now) for article_data in articles])
+            db.session.commit()
+            stats_cache.invalidate()
+            print(f"💾 Ingested {len(articles)} articles")
+        except Exception as e:
+            print(f"❌ Error ingesting articles: {e}")
+            db.session.rollback()
+    
+    def classify_articles(self, articles):
+        """Assign topic_id and relevance_score from the active topics' keywords"""
+        if not articles or not has_app_context():
+            return articles
+        
+        try:
+            from topic_classifier import classify_articles
+            return classify_articles(articles)
+        except Exception as e:
+            print(f"⚠️  Topic classification failed: {e}")
+            return articles
+    
+    def _article_row(self, article_data, fetched_at, digest_key=None, digest_rank=None):
+        """Column values for one NewsArticle row; every row carries the same keys"""
+        return {
+            'url': url_key(article_data['url']),
+            'title': article_data['title'][:300],
+            'description': article_data['description'],
+            'source': (article_data.get('source') or 'Unknown')[:100],
+            'published_at': parse_published_at(article_data.get('published_at')),
+            'date_fetched': fetched_at,
+            'summary': article_data.get('summary'),
+            'summary_tokens': article_data.get('summary_tokens'),
+            'extraction_status': article_data.get('extraction_status') or 'pending',
+            'topic_id': article_data.get('topic_id'),
+            'relevance_score': article_data.get('relevance_score'),
+            'digest_key': digest_key,
+            'digest_rank': digest_rank
+        }
+    
+    def _upsert_articles(self, rows, chunk_size=500):
+        """INSERT ... ON CONFLICT (url) DO UPDATE, one statement per chunk.
+        
+        Known summaries, extraction results and digest membership are kept when
+        the incoming row doesn't carry them.
+        """
+        from models import NewsArticle
+        from app import db
+        
+        # One row per URL, or the conflict clause would hit the same row twice
+        rows = list({row['url']: row for row in rows}.values())
+        
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            self._merge_articles(rows)
+            return
+        
+        table = NewsArticle.__table__
+        for start in range(0, len(rows), chunk_size):
+            stmt = insert(table).values(rows[start:start + chunk_size])
+            excluded = stmt.excluded
+            keep_known = lambda column: db.func.coalesce(excluded[column], table.c[column])
+            stmt = stmt.on_conflict_do_update(index_elements=['url'], set_={
+                'title': excluded.title,
+                'description': excluded.description,
+                'source': excluded.source,
+                'published_at': keep_known('published_at'),
+                'date_fetched': excluded.date_fetched,
+                'summary': keep_known('summary'),
+                'summary_tokens': keep_known('summary_tokens'),
+                # A real extraction result always wins over 'pending'
+                'extraction_status': db.case(
+                    (excluded.extraction_status == 'pending', table.c.extraction_status),
+                    else_=excluded.extraction_status
+                ),
+                'topic_id': keep_known('topic_id'),
+                'relevance_score': keep_known('relevance_score'),
+                'digest_key': keep_known('digest_key'),
+                'digest_rank': keep_known('digest_rank')
+            })
+            db.session.execute(stmt)
+    
+    def _merge_articles(self, rows):
+        """ORM fallback for dialects without ON CONFLICT, matching stored rows by URL"""
+        from models import NewsArticle
+        from app import db
+        
+        keep_known = ('published_at', 'summary', 'summary_tokens', 'topic_id', 'relevance_score',
+                      'digest_key', 'digest_rank')
+        stored = {article.url: article for article in
+                  NewsArticle.query.filter(NewsArticle.url.in_([row['url'] for row in rows]))}
+        for row in rows:
+            article = stored.get(row['url'])
+            if article is None:
+                db.session.add(NewsArticle(**row))
+                continue
+            for column, value in row.items():
+                if column in keep_known and value is None:
+                    continue
+                if column == 'extraction_status' and value == 'pending':
+                    continue
+                setattr(article, column, value)
+    
+    def _load_known_articles(self, urls):
+        """Stored extraction results for URLs we have already processed, keyed by the given URL"""
+        from models import NewsArticle
+        
+        if not urls or not has_app_context():
+            return {}
+        
+        # Rows hold URLs truncated to the column length
+        keys = {url_key(url): url for url in urls}
+        try:
+            known = NewsArticle.query.filter(
+                NewsArticle.url.in_(keys),
+                NewsArticle.extraction_status.in_(['success', 'failed'])
+            ).all()
+        except Exception as e:
+            print(f"⚠️  Could not load known articles: {e}")
+            return {}
+        
+        return {
+            keys[article.url]: {
+                'url': keys[article.url],
+                'extraction_status': article.extraction_status,
+                'full_text': None,
+                'summary': article.summary,
+                'summary_tokens': article.summary_tokens or 0,
+                'error': None
+            }
+            for article in known
+        }
+    
+    def digest_size(self):
+        """Articles to keep per digest: the pool size, or the largest active user's limit if bigger"""
+        from models import User
+        from app import db
+        
+        if not has_app_context():
+            return self.pool_size
+        try:
+            largest = db.session.query(db.func.max(User.max_articles)).filter(User.is_active == True).scalar()
+        except Exception as e:
+            print(f"⚠️  Could not read user article limits: {e}")
+            return self.pool_size
+        return max(self.pool_size, largest or 0)
     
     def fetch_ai_news(self, include_summaries=True):
         """Fetch latest AI-related news articles with Gemini summarization"""
         try:
-            if not self.api_key:
+            # Each user gets a slice ranked for their topics, so the digest must cover every limit
+            self.max_articles = self.digest_size()
+            self.candidate_pool = self.max_articles + 3
+            
+            if not self.api_key and not self.feed_urls:
                 print("⚠️  News API key not configured, using fallback news")
                 return self.get_fallback_news_with_summaries() if include_summaries else self.get_fallback_news()
             
-            params = {
-                'q': 'artificial intelligence OR machine learning OR AI OR "deep learning" OR "neural networks" OR OpenAI OR ChatGPT',
-                'language': 'en',
-                'sortBy': 'publishedAt',
-                'from': (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d'),
-                'pageSize': 8,  # Get more articles since some might fail extraction
-                'apiKey': self.api_key
-            }
+            # New NewsAPI articles and every configured feed, fetched concurrently and merged
+            print("📡 Fetching AI news from API and feeds...")
+            candidates = IngestionEngine(self.get_sources()).fetch_all()
+            for article_data in candidates:
+                article_data['description'] = self._truncate_description(article_data['description'])
             
-            print("📡 Fetching AI news from API...")
-            response = requests.get(self.base_url, params=params, timeout=15)
-            response.raise_for_status()
+            # Recent stored articles fill the rest
+            new_urls = {article_data['url'] for article_data in candidates}
+            candidates.extend(self._recent_stored_candidates(exclude={url_key(url) for url in new_urls}))
+            
+            # One candidate per story, so syndicated copies are never extracted or summarized twice
+            candidates = NearDuplicateDetector().collapse(candidates)
+            
+            if not candidates:
+                print("⚠️  No new or recent articles available, using fallback news")
+                return self.get_fallback_news_with_summaries() if include_summaries else self.get_fallback_news()
             
-            data = response.json()
-            articles = data.get('articles', [])
+            if include_summaries:
+                news_data = self._summarize_concurrently(candidates[:self.candidate_pool])
+            else:
+                news_data = candidates[:self.max_articles]
             
-            news_data = []
-            successful_summaries = 0
+            # Persist everything fetched (classified by topic) so later runs can skip known URLs
+            processed = {article_data['url']: article_data for article_data in news_data}
+            fetched = [processed.get(article_data['url'], article_data) for article_data in candidates
+                       if article_data['url'] in new_urls or article_data['url'] in processed]
+            self.classify_articles(fetched)
+            self.ingest_articles(fetched)
             
-            for i, article in enumerate(articles):
-                if len(news_data) >= 5:  # Limit to 5 final articles
-                    break
-                    
-                if (article.get('title') and 
-                    article.get('url') and 
-                    article.get('description') and
-                    article.get('title') != '[Removed]' and
-                    'removed' not in article.get('description', '').lower()):
-                    
-                    print(f"📄 Processing article {i+1}: {article['title'][:60]}...")
-                    
-                    article_data = {
-                        'title': article['title'],
-                        'url': article['url'],
-                        'description': self._truncate_description(article['description']),
-                        'source': article.get('source', {}).get('name', 'Unknown'),
-                        'published_at': article.get('publishedAt')
-                    }
-                    
-                    # Add Gemini summarization if enabled
-                    if include_summaries:
-                        summary_result = self.summarizer.summarize_article(article['url'])
-                        
-                        article_data.update({
-                            'full_text': summary_result['full_text'],
-                            'summary': summary_result['summary'],
-                            'summary_tokens': summary_result['summary_tokens'],
-                            'extraction_status': summary_result['extraction_status']
-                        })
-                        
-                        if summary_result['extraction_status'] == 'success':
-                            successful_summaries += 1
-                        
-                        if summary_result['error']:
-                            print(f"⚠️  Summarization warning: {summary_result['error']}")
-                    
-                    news_data.append(article_data)
-                    
-                    # Small delay between requests to be respectful
-                    if include_summaries and i < len(articles) - 1:
-                        import time
-                        time.sleep(0.5)
+            successful_summaries = len([a for a in news_data if a.get('extraction_status') == 'success'])
             
             print(f"✅ Processed {len(news_data)} articles")
             if include_summaries:
@@ -93,6 +287,136 @@ class NewsService:
             print(f"❌ Unexpected error in news fetching: {e}")
             return self.get_fallback_news_with_summaries() if include_summaries else self.get_fallback_news()
     
+    def get_sources(self):
+        """NewsAPI (when a key is configured) plus one source per configured feed"""
+        sources = [NewsAPISource(self.fetcher)] if self.api_key else []
+        sources.extend(FeedSource(url) for url in self.feed_urls)
+        return sources
+    
+    def _recent_stored_candidates(self, exclude=()):
+        """Articles ingested by earlier runs within the last day, newest first; exclude holds stored URL keys"""
+        from models import NewsArticle
+        
+        if not has_app_context():
+            return []
+        
+        try:
+            since = datetime.utcnow() - timedelta(days=1)
+            recent = NewsArticle.query.filter(
+                NewsArticle.published_at >= since,
+                NewsArticle.extraction_status != 'fallback'
+            ).order_by(NewsArticle.published_at.desc()).limit(self.candidate_pool).all()
+        except Exception as e:
+            print(f"⚠️  Could not load recent articles: {e}")
+            return []
+        
+        return [
+            {
+                'title': article.title,
+                'url': article.url,
+                'description': article.description,
+                'source': article.source,
+                'published_at': article.published_at.isoformat() + 'Z' if article.published_at else None
+            }
+            for article in recent if article.url not in exclude and article.description
+        ]
+    
+    def _process_article(self, article_data, stop=None):
+        """Extract (and, outside batch mode, summarize) one candidate article on a worker thread.
+        
+        Returns None without doing the work once `stop` is set, i.e. the digest is already complete.
+        """
+        if stop is not None and stop.is_set():
+            return None
+        print(f"📄 Processing article: {article_data['title'][:60]}...")
+        
+        result, article_text = self.summarizer.prepare_article(article_data['url'])
+        
+        # In batch mode summarization is deferred so selected articles share Gemini requests
+        if self.summarizer.batch_mode or article_text is None:
+            return result, article_text
+        if stop is not None and stop.is_set():
+            return None
+        return self.summarizer.complete_article(result, article_text), None
+    
+    def _merge_summary(self, article_data, summary_result):
+        """Attach a summarizer result to the article dict"""
+        if summary_result['error']:
+            print(f"⚠️  Summarization warning: {summary_result['error']}")
+        
+        return dict(article_data, **{
+            'full_text': summary_result['full_text'],
+            'summary': summary_result['summary'],
+            'summary_tokens': summary_result['summary_tokens'],
+            'extraction_status': summary_result['extraction_status']
+        })
+    
+    def _summarize_concurrently(self, candidates):
+        """Run download, parse and summarization for candidates on a bounded thread pool.
+        
+        Downloads are throttled per host by the summarizer's host limiter. The pool
+        stops as soon as enough articles were extracted successfully; remaining
+        articles that failed extraction only fill the digest if there are not
+        enough good ones. In batch mode the selected articles are then summarized
+        together instead of one request each.
+        """
+        if not candidates:
+            return []
+        
+        # URLs processed on earlier runs reuse their stored result instead of being extracted again
+        known = self._load_known_articles([article_data['url'] for article_data in candidates])
+        results = {
+            index: (known[article_data['url']], None)
+            for index, article_data in enumerate(candidates) if article_data['url'] in known
+        }
+        successes = len([1 for result, _ in results.values() if result['extraction_status'] == 'success'])
+        if known:
+            print(f"🗃️  Reusing {len(known)} already-processed articles")
+        
+        to_process = [index for index in range(len(candidates)) if index not in results]
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(to_process))))
+        stop = threading.Event()
+        try:
+            futures = {} if successes >= self.max_articles else {
+                executor.submit(self._process_article, candidates[index], stop): index
+                for index in to_process
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    print(f"❌ Error processing {candidates[index]['url']}: {e}")
+                    continue
+                if outcome is None:
+                    continue
+                
+                results[index] = outcome
+                if outcome[0]['extraction_status'] == 'success':
+                    successes += 1
+                    if successes >= self.max_articles:
+                        break
+        finally:
+            # Don't wait for stragglers once the digest is complete, and stop them before
+            # their next download or Gemini call instead of spending quota on discarded results
+            stop.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        good = [index for index in sorted(results) if results[index][0]['extraction_status'] == 'success']
+        selected = good[:self.max_articles]
+        if len(selected) < self.max_articles:
+            failed = [index for index in sorted(results) if index not in good]
+            selected += failed[:self.max_articles - len(selected)]
+        
+        # Keep the API's publishedAt ordering in the final digest
+        selected = sorted(selected)
+        summary_results = self.summarizer.summarize_batch([results[index] for index in selected])
+        
+        return [
+            self._merge_summary(candidates[index], summary_result)
+            for index, summary_result in zip(selected, summary_results)
+        ]
+    
     def _truncate_description(self, description):
         """Truncate description to reasonable length"""
         if len(description) > 250:
@@ -151,11 +475,10 @@ class NewsService:
             
             params = {
                 'q': 'artificial intelligence',
-                'pageSize': 1,
-                'apiKey': self.api_key
+                'pageSize': 1
             }
             
-            response = requests.get(self.base_url, params=params, timeout=5)
+            response = get_session().get(self.base_url, params=params, headers={'X-Api-Key': self.api_key}, timeout=5)
             response.raise_for_status()
             
             return True, "API connection successful"
@@ -0,0 +1,233 @@
+# news_sources.py - Pluggable news sources ingested concurrently with asyncio
+import os
+import re
+import html
+import time
+import asyncio
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from flask import has_app_context, current_app
+from summary_cache import normalize_url
+from news_fetcher import parse_published_at
+from http_client import get_session
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+CONTENT = '{http://purl.org/rss/1.0/modules/content/}'
+TAG_RE = re.compile(r'<[^>]+>')
+
+def clean_text(text):
+    """Strip markup and collapse whitespace in feed text"""
+    if not text:
+        return ''
+    return ' '.join(html.unescape(TAG_RE.sub(' ', text)).split())
+
+def feed_urls_from_env():
+    """Feed URLs from NEWS_FEED_URLS (comma separated) and NEWS_FEEDS_FILE (one per line)"""
+    urls = [url.strip() for url in os.environ.get('NEWS_FEED_URLS', '').split(',') if url.strip()]
+    feeds_file = os.environ.get('NEWS_FEEDS_FILE')
+    if feeds_file and os.path.exists(feeds_file):
+        with open(feeds_file) as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    return urls
+
+class NewsSource(ABC):
+    """A source yields candidate dicts: title, url, description, source, published_at"""
+
+    name = 'source'
+
+    @abstractmethod
+    def fetch(self, session):
+        """Candidate dicts from this source, fetched over the shared session"""
+
+class NewsAPISource(NewsSource):
+    """New articles from the incremental NewsAPI fetcher"""
+
+    name = 'newsapi'
+
+    def __init__(self, fetcher):
+        self.fetcher = fetcher
+
+    def fetch(self, session):
+        candidates = []
+        for article in self.fetcher.fetch_new_articles():
+            if (article.get('title') and
+                article.get('url') and
+                article.get('description') and
+                article.get('title') != '[Removed]' and
+                'removed' not in article.get('description', '').lower()):
+
+                candidates.append({
+                    'title': article['title'],
+                    'url': article['url'],
+                    'description': article['description'],
+                    'source': (article.get('source') or {}).get('name', 'Unknown'),
+                    'published_at': article.get('publishedAt')
+                })
+        return candidates
+
+class FeedSource(NewsSource):
+    """An RSS 2.0 or Atom feed, parsed incrementally as the response streams in"""
+
+    def __init__(self, url, max_age=timedelta(days=1), timeout=10):
+        self.url = url
+        self.name = url
+        self.max_age = max_age
+        self.timeout = timeout
+
+    def fetch(self, session):
+        with session.get(self.url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            parser = ET.XMLPullParser(events=('start', 'end'))
+            state = {'items': [], 'feed_title': None, 'in_item': 0}
+            for chunk in response.iter_content(chunk_size=16384):
+                parser.feed(chunk)
+                self._read_events(parser, state)
+            parser.close()
+            self._read_events(parser, state)
+        items, feed_title = state['items'], state['feed_title']
+
+        cutoff = datetime.utcnow() - self.max_age
+        candidates = []
+        for item in items:
+            published_at = parse_published_at(item['published_at'])
+            if published_at and published_at < cutoff:
+                continue
+            if item['title'] and item['url']:
+                item['source'] = item['source'] or feed_title or 'Unknown'
+                item['description'] = item['description'] or item['title']
+                candidates.append(item)
+        return candidates
+
+    def _read_events(self, parser, state):
+        """Turn completed <item>/<entry> elements into candidates and free them"""
+        for event, element in parser.read_events():
+            is_item = element.tag in ('item', ATOM + 'entry')
+            if event == 'start':
+                state['in_item'] += is_item
+                continue
+            if is_item:
+                state['in_item'] -= 1
+                state['items'].append(self._parse_item(element))
+                element.clear()
+            elif element.tag in ('title', ATOM + 'title') and not state['in_item'] and state['feed_title'] is None:
+                state['feed_title'] = clean_text(element.text) or None
+
+    def _parse_item(self, element):
+        if element.tag == 'item':
+            published = element.findtext('pubDate') or element.findtext('{http://purl.org/dc/elements/1.1/}date')
+            return {
+                'title': clean_text(element.findtext('title')),
+                'url': (element.findtext('link') or element.findtext('guid') or '').strip(),
+                'description': clean_text(element.findtext('description') or element.findtext(CONTENT + 'encoded')),
+                'source': clean_text(element.findtext('source')) or None,
+                'published_at': self._iso_timestamp(published)
+            }
+
+        url = ''
+        for link in element.findall(ATOM + 'link'):
+            if link.get('rel', 'alternate') == 'alternate':
+                url = link.get('href', '')
+                break
+        published = element.findtext(ATOM + 'published') or element.findtext(ATOM + 'updated')
+        return {
+            'title': clean_text(element.findtext(ATOM + 'title')),
+            'url': url.strip(),
+            'description': clean_text(element.findtext(ATOM + 'summary') or element.findtext(ATOM + 'content')),
+            'source': None,
+            'published_at': self._iso_timestamp(published)
+        }
+
+    def _iso_timestamp(self, value):
+        """RFC 822 (RSS) or ISO-8601 (Atom) dates as an ISO-8601 UTC string"""
+        if not value:
+            return None
+        value = value.strip()
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            parsed = None
+        if parsed is None:
+            parsed = parse_published_at(value)
+            return parsed.isoformat() + 'Z' if parsed else None
+        if parsed.tzinfo:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed.isoformat() + 'Z'
+
+class IngestionEngine:
+    """Fetch every source concurrently and merge them into one deduplicated stream.
+
+    Blocking HTTP runs on the event loop's executor behind a semaphore, over the
+    shared pooled session, so connections to the same feed host are reused
+    across sources.
+    """
+
+    def __init__(self, sources, concurrency=None, session=None):
+        self.sources = sources
+        self.concurrency = concurrency or int(os.environ.get('NEWS_INGEST_CONCURRENCY', 32))
+        self.session = session or get_session()
+        self.stats = {}
+
+    def fetch_all(self):
+        """Merged candidates from every source, newest first, deduplicated by normalized URL"""
+        if not self.sources:
+            return []
+        started = time.monotonic()
+        results = asyncio.run(self._gather())
+
+        merged = {}
+        malformed = 0
+        for articles in results:
+            for article_data in articles:
+                try:
+                    key = normalize_url(article_data['url'])
+                except ValueError:
+                    malformed += 1  # e.g. 'http://[abc'; one bad link never aborts the run
+                    continue
+                if key not in merged:
+                    merged[key] = article_data
+        if malformed:
+            print(f"⚠️  Skipped {malformed} articles with malformed URLs")
+
+        fetched = sum(len(articles) for articles in results)
+        failed = [name for name, stats in self.stats.items() if stats['error']]
+        print(f"🌐 Ingested {len(merged)} unique articles ({fetched} fetched) from "
+              f"{len(self.sources) - len(failed)}/{len(self.sources)} sources in {time.monotonic() - started:.2f}s")
+        return sorted(merged.values(), key=lambda article_data: parse_published_at(article_data.get('published_at')) or datetime.min,
+                      reverse=True)
+
+    async def _gather(self):
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        app = current_app._get_current_object() if has_app_context() else None
+
+        # One executor thread per concurrent fetch so the semaphore is the only limit
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return await asyncio.gather(*[
+                self._fetch_source(loop, executor, semaphore, source, app) for source in self.sources
+            ])
+
+    async def _fetch_source(self, loop, executor, semaphore, source, app):
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                articles = await loop.run_in_executor(executor, self._fetch_in_context, source, app)
+                error = None
+            except Exception as e:
+                print(f"⚠️  Source {source.name} failed: {e}")
+                articles, error = [], str(e)
+            self.stats[source.name] = {
+                'articles': len(articles),
+                'seconds': round(time.monotonic() - started, 3),
+                'error': error
+            }
+            return articles
+
+    def _fetch_in_context(self, source, app):
+        """Sources may use the database (e.g. the NewsAPI cursor), so carry the app context over"""
+        if app is None:
+            return source.fetch(self.session)
+        with app.app_context():
+            return source.fetch(self.session)
@@ -1,16 +1,180 @@
 # notification_service.py - Complete Slack Integration
+import os
+import heapq
+import threading
+import time
 import requests
 import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
+from urllib.parse import urlparse
 from models import NotificationChannel, EmailLog
 from app import db
+from http_client import get_session
+
+SLACK_FANOUT_WORKERS = int(os.environ.get('SLACK_FANOUT_WORKERS', 32))
+SLACK_PER_HOST = int(os.environ.get('SLACK_PER_HOST', 8))  # In-flight posts per webhook host
+SLACK_MAX_ATTEMPTS = int(os.environ.get('SLACK_MAX_ATTEMPTS', 3))
+
+# Placeholder encoded in place of the recipient, spliced per user
+SLACK_USER_PLACEHOLDER = '__SLACK_USER_EMAIL__'
+SLACK_PAYLOAD_CACHE_SIZE = 32
+
+_slack_payload_cache = OrderedDict()
+_slack_payload_lock = threading.Lock()
+
+def _slack_payload_key(articles, current_date):
+    """Identify an article set, with every field the Slack blocks show, for one day"""
+    return (current_date, tuple(
+        (article.get('url'), article.get('title'), article.get('description'), article.get('summary'),
+         article.get('source'), article.get('extraction_status'), article.get('summary_tokens'))
+        for article in articles or ()
+    ))
+
+class SlackDispatcher:
+    """Post many webhook payloads concurrently.
+
+    In-flight posts are capped per webhook host. A 429 reschedules the post
+    after its Retry-After instead of blocking a worker, and holds back other
+    posts to the same webhook until then. Every delivery reports its latency.
+    """
+
+    def __init__(self, timeout=10, max_workers=SLACK_FANOUT_WORKERS, per_host=SLACK_PER_HOST,
+                 max_attempts=SLACK_MAX_ATTEMPTS):
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._not_before = {}
+
+    def dispatch(self, deliveries):
+        """Send (key, webhook_url, payload) deliveries; returns key -> outcome dict"""
+        results = {}
+        if not deliveries:
+            return results
+
+        started = time.monotonic()
+        delayed = []  # (ready_at, sequence, delivery, attempt)
+        sequence = 0
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(deliveries)))) as executor:
+            pending = {executor.submit(self._post, delivery): (delivery, 1) for delivery in deliveries}
+            while pending or delayed:
+                now = time.monotonic()
+                while delayed and delayed[0][0] <= now:
+                    _, _, delivery, attempt = heapq.heappop(delayed)
+                    pending[executor.submit(self._post, delivery)] = (delivery, attempt)
+                if not pending:
+                    time.sleep(max(delayed[0][0] - time.monotonic(), 0))
+                    continue
+
+                timeout = max(delayed[0][0] - now, 0) if delayed else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    delivery, attempt = pending.pop(future)
+                    outcome = future.result()
+                    if outcome.pop('held_back', False):
+                        # Never reached the network, so it doesn't use up an attempt
+                        sequence += 1
+                        heapq.heappush(delayed, (time.monotonic() + outcome['retry_after'], sequence, delivery, attempt))
+                        continue
+                    outcome['attempts'] = attempt
+                    if outcome['retry_after'] is not None and attempt < self.max_attempts:
+                        sequence += 1
+                        heapq.heappush(delayed, (time.monotonic() + outcome['retry_after'], sequence, delivery, attempt + 1))
+                        continue
+                    if outcome['retry_after'] is not None:
+                        outcome['error'] = 'Slack rate limit: retries exhausted'
+                    results[delivery[0]] = outcome
+
+        latencies = sorted(outcome['latency_ms'] for outcome in results.values())
+        sent = len([1 for outcome in results.values() if outcome['sent']])
+        print(f"📣 Slack fan-out: {sent}/{len(results)} delivered in {time.monotonic() - started:.2f}s "
+              f"(p50 {latencies[len(latencies) // 2]:.0f}ms, max {latencies[-1]:.0f}ms)")
+        return results
+
+    def _host_slot(self, host):
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _post(self, delivery):
+        """One webhook post; a 429, or a webhook still held back after one, comes back with retry_after set"""
+        key, webhook_url, payload = delivery
+        outcome = {'sent': False, 'error': None, 'status_code': None, 'latency_ms': 0.0, 'retry_after': None}
+
+        with self._lock:
+            wait_seconds = self._not_before.get(webhook_url, 0) - time.monotonic()
+        if wait_seconds > 0:
+            outcome['retry_after'] = wait_seconds
+            outcome['held_back'] = True
+            return outcome
+
+        started = None
+        try:
+            with self._host_slot(urlparse(webhook_url).hostname):
+                started = time.monotonic()
+                if isinstance(payload, (bytes, str)):
+                    response = get_session().post(webhook_url, data=payload, timeout=self.timeout,
+                                                  headers={'Content-Type': 'application/json'})
+                else:
+                    response = get_session().post(webhook_url, json=payload, timeout=self.timeout)
+            outcome['status_code'] = response.status_code
+
+            if response.status_code == 429:
+                try:
+                    retry_after = max(float(response.headers.get('Retry-After', 1)), 0.1)
+                except ValueError:
+                    retry_after = 1.0
+                with self._lock:
+                    self._not_before[webhook_url] = time.monotonic() + retry_after
+                outcome['retry_after'] = retry_after
+            elif response.ok and response.text.strip() == 'ok':
+                outcome['sent'] = True
+            else:
+                outcome['error'] = f"Slack API returned {response.status_code}: {response.text[:200]}"
+        except requests.exceptions.Timeout:
+            outcome['error'] = 'Slack webhook request timed out'
+        except requests.exceptions.RequestException as e:
+            outcome['error'] = f"Slack webhook request failed: {str(e)}"
+        if started is not None:
+            outcome['latency_ms'] = round((time.monotonic() - started) * 1000, 1)
+        return outcome
 
 class NotificationService:
     def __init__(self):
         self.slack_timeout = 10
         self.teams_timeout = 10
+        self.dispatcher = SlackDispatcher(timeout=self.slack_timeout)
         print("📢 NotificationService initialized with Slack integration")
         
+    def encode_slack_payload(self, articles, user_email):
+        """JSON bytes ready to post: blocks encoded once per article set, recipient spliced in"""
+        current_date = datetime.now().strftime('%A, %B %d, %Y')
+        key = _slack_payload_key(articles, current_date)
+        
+        with _slack_payload_lock:
+            parts = _slack_payload_cache.get(key)
+            if parts is not None:
+                _slack_payload_cache.move_to_end(key)
+        
+        if parts is None:
+            encoded = json.dumps(self.format_articles_for_slack(articles, SLACK_USER_PLACEHOLDER)).encode('utf-8')
+            prefix, found, suffix = encoded.partition(SLACK_USER_PLACEHOLDER.encode('utf-8'))
+            parts = (prefix, suffix if found else None)
+            with _slack_payload_lock:
+                _slack_payload_cache[key] = parts
+                while len(_slack_payload_cache) > SLACK_PAYLOAD_CACHE_SIZE:
+                    _slack_payload_cache.popitem(last=False)
+        
+        prefix, suffix = parts
+        if suffix is None:
+            return prefix  # The no-articles payload doesn't mention the recipient
+        return prefix + json.dumps(user_email)[1:-1].encode('utf-8') + suffix
+    
     def format_articles_for_slack(self, articles, user_email):
         """Format articles for Slack message with rich blocks"""
         if not articles:
@@ -147,16 +311,16 @@ class NotificationService:
         try:
             if custom_payload:
                 # Send custom payload directly (for test messages)
-                payload = custom_payload
+                payload = json.dumps(custom_payload).encode('utf-8')
             else:
-                # Format articles for regular notification
-                payload = self.format_articles_for_slack(articles, user_email)
+                # Pre-encoded blocks for regular notification
+                payload = self.encode_slack_payload(articles, user_email)
             
             print(f"📤 Sending Slack notification to {channel_name or 'webhook'}...")
             
-            response = requests.post(
+            response = get_session().post(
                 webhook_url,
-                json=payload,
+                data=payload,
                 timeout=self.slack_timeout,
                 headers={'Content-Type': 'application/json'}
             )
@@ -184,50 +348,71 @@ class NotificationService:
             print(f"❌ {error_msg}")
             return False
     
-    def send_notifications_to_user(self, user, articles):
-        """Send notifications to all active channels for a user"""
-        results = {
-            'email': {'sent': False, 'error': None},
-            'slack': {'sent': False, 'error': None},
-            'teams': {'sent': False, 'error': None},
-            'whatsapp': {'sent': False, 'error': None}
-        }
+    def send_notifications_to_users(self, user_articles, recorder=None):
+        """Fan out to every active channel of many users at once; returns user id -> results.
         
-        try:
+        Sent channels are stamped through the given DeliveryRecorder (flushed by the
+        caller), or through one flushed here when none is passed.
+        """
+        from delivery_log import DeliveryRecorder
+        
+        own_recorder = recorder is None
+        recorder = recorder or DeliveryRecorder()
+        all_results = {}
+        deliveries = []
+        channels = {}
+        
+        for user, articles in user_articles:
+            results = all_results[user.id] = {
+                'email': {'sent': False, 'error': None},
+                'slack': {'sent': False, 'error': None},
+                'teams': {'sent': False, 'error': None},
+                'whatsapp': {'sent': False, 'error': None}
+            }
+            
             # Check if user has any notification channels
             if not hasattr(user, 'notification_channels') or not user.notification_channels:
-                print(f"📢 No notification channels configured for {user.email}")
-                return results
+                continue
             
-            # Send to all active notification channels
             for channel in user.notification_channels:
                 if not channel.is_active:
                     continue
                 
                 if channel.channel_type == 'slack' and channel.webhook_url:
-                    success, error = self.send_slack_notification(
-                        channel.webhook_url, 
-                        articles, 
-                        user.email, 
-                        channel.channel_name
-                    )
-                    results['slack'] = {'sent': success, 'error': error}
-                    if success:
-                        channel.last_sent_at = datetime.utcnow()
+                    deliveries.append((channel.id, channel.webhook_url, self.encode_slack_payload(articles, user.email)))
+                    channels[channel.id] = (user, channel)
                 
                 elif channel.channel_type == 'teams' and channel.webhook_url:
                     # Teams integration - placeholder for now
                     print(f"📤 Teams integration not yet implemented for {channel.channel_name}")
                     results['teams'] = {'sent': False, 'error': 'Not implemented yet'}
+        
+        if not deliveries:
+            return all_results
+        
+        try:
+            outcomes = self.dispatcher.dispatch(deliveries)
+            for channel_id, outcome in outcomes.items():
+                user, channel = channels[channel_id]
+                if outcome['sent']:
+                    recorder.record_channel_sent(channel_id)
+                else:
+                    print(f"❌ Slack delivery to {channel.channel_name or channel.id} for {user.email} failed: {outcome['error']}")
+                # A user counts as reached on Slack if any of their channels succeeded
+                slack = all_results[user.id]['slack']
+                if outcome['sent'] or not slack['sent']:
+                    all_results[user.id]['slack'] = {'sent': outcome['sent'], 'error': outcome['error'],
+                                                     'latency_ms': outcome['latency_ms']}
             
-            # Commit channel updates
-            db.session.commit()
+            # Stamp channel updates in chunked UPDATEs
+            if own_recorder:
+                recorder.flush()
             
         except Exception as e:
-            print(f"❌ Error sending notifications to user {user.email}: {e}")
+            print(f"❌ Error sending notifications: {e}")
             db.session.rollback()
         
-        return results
+        return all_results
 
 # Test function
 def test_slack_notification():
@@ -0,0 +1,54 @@
+# personalization.py - Per-topic digest assembly for cohorts of users
+from collections import defaultdict
+
+# UserPreference.priority: 1=high, 2=medium, 3=low
+PRIORITY_WEIGHTS = {1: 3.0, 2: 2.0, 3: 1.0}
+
+def cohort_key(user):
+    """Users with the same topics, priorities and article limit get the same digest"""
+    topic_priorities = frozenset(
+        (pref.topic_id, pref.priority or 1) for pref in user.preferences if pref.is_active
+    )
+    return topic_priorities, user.max_articles or 5
+
+def rank_articles(articles, topic_priorities, max_articles):
+    """Order classified articles for one cohort and keep the top max_articles.
+
+    Articles in a followed topic come first, higher-priority topics before
+    lower ones and keyword relevance only breaking ties within a priority;
+    everything else keeps the digest order.
+    """
+    weights = {topic_id: PRIORITY_WEIGHTS.get(priority, 1.0) for topic_id, priority in topic_priorities}
+
+    def score(indexed_article):
+        index, article = indexed_article
+        weight = weights.get(article.get('topic_id'), 0.0)
+        if not weight:
+            return 0.0, 0.0, index
+        return -weight, -(article.get('relevance_score') or 0.0), index
+
+    ranked = sorted(enumerate(articles), key=score)
+    return [article for _, article in ranked[:max_articles]]
+
+def personalize_digests(users, articles, rankings=None):
+    """Map user id -> personalized article list, ranking once per cohort.
+
+    Pass the same rankings dict across calls over one digest to reuse cohort
+    rankings between batches of users.
+    """
+    rankings = {} if rankings is None else rankings
+    cohorts = defaultdict(list)
+    for user in users:
+        cohorts[cohort_key(user)].append(user)
+
+    user_articles = {}
+    for key, members in cohorts.items():
+        if key not in rankings:
+            topic_priorities, max_articles = key
+            rankings[key] = rank_articles(articles, topic_priorities, max_articles)
+        ranked = rankings[key]
+        for user in members:
+            user_articles[user.id] = ranked
+
+    print(f"🎯 Personalized digests for {len(users)} users in {len(cohorts)} cohorts")
+    return user_articles
@@ -1,8 +1,10 @@
 # routes.py - Updated imports
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app
 from models import User, NewsArticle, EmailLog, Topic, UserPreference, NotificationChannel, initialize_default_topics
+from models import DashboardSummary, TopicSubscriberCount
 from app import db
 from news_service import NewsService
+from stats_service import stats_cache, refresh_dashboard_summary
 from datetime import datetime, timedelta, time
 import re
 import pytz
@@ -53,11 +55,13 @@ def subscribe():
                 else:
                     existing_user.is_active = True
                     existing_user.date_subscribed = datetime.utcnow()
+                    existing_user.refresh_next_send_at()
                     db.session.commit()
                     flash('Welcome back! Your subscription has been reactivated. 🎉', 'success')
                     return redirect(url_for('main.preferences_form', email=email))
             else:
                 new_user = User(email=email)
+                new_user.refresh_next_send_at()
                 db.session.add(new_user)
                 db.session.commit()
                 flash('Successfully subscribed! Now customize your preferences. 🚀', 'success')
@@ -115,6 +119,9 @@ def update_preferences():
         user.frequency = request.form.get('frequency', 'daily')
         user.max_articles = int(request.form.get('max_articles', 5))
         
+        # Time, timezone or frequency may have changed - recompute the send slot
+        user.refresh_next_send_at()
+        
         # Update topic preferences
         selected_topics = request.form.getlist('topics')
         
@@ -134,6 +141,9 @@ def update_preferences():
         
         db.session.commit()
         
+        # Reload with preferences and topics eagerly loaded for serialization
+        user = User.query_with_preferences().filter_by(id=user.id).first()
+        
         return jsonify({
             'success': True,
             'message': 'Preferences updated successfully! 🎉',
@@ -193,7 +203,7 @@ def preview_email():
 def get_user_info(email):
     """Get user information via API"""
     try:
-        user = User.query.filter_by(email=email.lower()).first()
+        user = User.query_with_preferences().filter_by(email=email.lower()).first()
         if not user:
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
@@ -207,9 +217,9 @@ def get_user_info(email):
 @main.route('/api/topics')
 def get_topics_api():
     """Get all active topics via API"""
-    topics = Topic.query.filter_by(is_active=True).all()
+    topics = Topic.active_with_subscriber_counts()
     return jsonify({
-        'topics': [topic.to_dict() for topic in topics]
+        'topics': [topic.to_dict(subscriber_count=count) for topic, count in topics]
     })
 
 @main.route('/api/slack/test', methods=['POST'])
@@ -325,65 +335,25 @@ def setup_notification_channel():
 def get_topics():
     """Get all available topics"""
     try:
-        topics = Topic.query.filter_by(is_active=True).all()
+        topics = Topic.active_with_subscriber_counts()
         return jsonify({
             'success': True,
-            'topics': [topic.to_dict() for topic in topics]
+            'topics': [topic.to_dict(subscriber_count=count) for topic, count in topics]
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @main.route('/api/stats')
 def get_stats():
-    """Get dashboard statistics"""
+    """Get dashboard statistics (cached snapshot, 304 on unchanged repeat polls)"""
     try:
-        from datetime import datetime, timedelta
-        from sqlalchemy import func
-        
-        # Get actual counts from database
-        total_subscribers = User.query.filter_by(is_active=True).count()
-        total_topics = Topic.query.filter_by(is_active=True).count()
-        
-        # Get articles from today
-        today = datetime.utcnow().date()
-        today_start = datetime.combine(today, datetime.min.time())
-        today_end = datetime.combine(today, datetime.max.time())
-        daily_articles = NewsArticle.query.filter(
-            NewsArticle.date_fetched >= today_start,
-            NewsArticle.date_fetched <= today_end
-        ).count()
-        
-        # Get average articles per user based on user preferences
-        avg_articles_result = db.session.query(func.avg(User.max_articles)).filter_by(is_active=True).scalar()
-        avg_articles_per_user = int(avg_articles_result) if avg_articles_result else 5
-        
-        # Get recent articles
-        recent_articles = NewsArticle.query.order_by(NewsArticle.date_fetched.desc()).limit(3).all()
-        
-        # Format articles for frontend
-        articles_data = []
-        for article in recent_articles:
-            articles_data.append({
-                'id': article.id,
-                'title': article.title,
-                'description': article.description or article.summary if hasattr(article, 'summary') else article.description,
-                'url': article.url,
-                'source': article.source,
-                'published_at': article.published_at.isoformat() if article.published_at else None,
-                'topic_name': article.topic.name if article.topic else None,
-                'category': article.topic.name if article.topic else 'General'
-            })
+        body, etag, last_modified = stats_cache.get()
         
-        return jsonify({
-            'success': True,
-            'stats': {
-                'total_subscribers': total_subscribers,
-                'total_topics': total_topics,
-                'daily_articles': daily_articles,
-                'avg_articles_per_user': avg_articles_per_user,
-                'recent_articles': articles_data
-            }
-        })
+        response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True  # Clients revalidate with If-None-Match
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -416,6 +386,7 @@ def api_subscribe():
             else:
                 existing_user.is_active = True
                 existing_user.date_subscribed = datetime.utcnow()
+                existing_user.refresh_next_send_at()
                 db.session.commit()
                 return jsonify({
                     'success': True,
@@ -424,6 +395,7 @@ def api_subscribe():
                 })
         else:
             new_user = User(email=email)
+            new_user.refresh_next_send_at()
             db.session.add(new_user)
             db.session.commit()
             return jsonify({
@@ -441,7 +413,9 @@ def test_send_now():
     """Manual test email sending"""
     try:
         from news_service import NewsService
-        from email_service import send_news_email
+        from email_service import queue_news_email, delivery_error, PooledEmailSender
+        from personalization import personalize_digests
+        from flask import current_app
         
         users = User.query.filter_by(is_active=True).all()
         if not users:
@@ -450,18 +424,25 @@ def test_send_now():
                 'message': 'No active subscribers found.'
             })
         
+        # Same cached daily digest the scheduler sends
         news_service = NewsService()
-        articles = news_service.fetch_ai_news()
+        articles = news_service.get_cached_digest()
         
         if not articles:
             articles = news_service.get_fallback_news()
         
+        # Each subscriber gets the digest ranked for their topics and cut to their limit
+        user_articles = personalize_digests(users, articles)
+        with PooledEmailSender(current_app._get_current_object()) as email_sender:
+            deliveries = [(user, queue_news_email(user.email, user_articles[user.id], email_sender)) for user in users]
+        
         results = []
-        for user in users:
-            success = send_news_email(user.email, articles)
+        for user, email_future in deliveries:
+            error = delivery_error(email_future)
             results.append({
                 'email': user.email,
-                'success': success
+                'success': error is None,
+                'error': error
             })
         
         return jsonify({
@@ -482,23 +463,23 @@ def test_send_now():
 def admin_dashboard():
     """Basic admin dashboard"""
     try:
-        total_users = User.query.count()
-        active_users = User.query.filter_by(is_active=True).count()
-        total_topics = Topic.query.filter_by(is_active=True).count()
-        total_articles = NewsArticle.query.count()
+        # Counts come from the materialized summary the scheduler keeps fresh
+        summary = db.session.get(DashboardSummary, 1) or refresh_dashboard_summary()
         
         recent_subscribers = User.query.order_by(User.date_subscribed.desc()).limit(10).all()
-        popular_topics = db.session.query(Topic, db.func.count(UserPreference.id).label('count'))\
-            .join(UserPreference).filter(UserPreference.is_active==True)\
-            .group_by(Topic.id).order_by(db.desc('count')).limit(5).all()
+        popular_topics = db.session.query(Topic, TopicSubscriberCount.subscriber_count)\
+            .join(TopicSubscriberCount, TopicSubscriberCount.topic_id == Topic.id)\
+            .filter(Topic.is_active == True, TopicSubscriberCount.subscriber_count > 0)\
+            .order_by(TopicSubscriberCount.subscriber_count.desc()).limit(5).all()
         
         return render_template('admin.html',
-                             total_users=total_users,
-                             active_users=active_users,
-                             total_topics=total_topics,
-                             total_articles=total_articles,
+                             total_users=summary.total_users,
+                             active_users=summary.active_users,
+                             total_topics=summary.total_topics,
+                             total_articles=summary.total_articles,
                              recent_subscribers=recent_subscribers,
-                             popular_topics=popular_topics)
+                             popular_topics=popular_topics,
+                             summary_refreshed_at=summary.refreshed_at)
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -530,6 +511,17 @@ def health_check():
             'error': str(e)
         }), 500
 
+@main.route('/api/cache-stats')
+def cache_stats():
+    """Hit/miss counters for the in-process caches and HTTP connection reuse"""
+    from summary_cache import summary_cache
+    from http_client import http_stats
+    return jsonify({
+        'success': True,
+        'summary_cache': summary_cache.stats(),
+        'http_pool': http_stats()
+    })
+
 
 # Add these routes to your existing routes.py
 
@@ -9,6 +9,31 @@ load_dotenv()
 # Add current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+def worker_main(processes):
+    """Run delivery worker processes that drain the durable delivery queue"""
+    from delivery_queue import start_workers
+    
+    print(f"👷 Starting {processes} delivery workers...")
+    start_workers(processes)
+    return 0
+
+def scheduler_main():
+    """Run a scheduler node without the web server; start several with SCHEDULER_SHARDS set"""
+    import time
+    from app import create_app
+    from scheduler_service import start_scheduler
+    
+    app = create_app()
+    scheduler = start_scheduler(app)
+    if scheduler is None:
+        return 1
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down scheduler node...")
+    return 0
+
 def main():
     """Main application entry point"""
     try:
@@ -65,5 +90,14 @@ def main():
     return 0
 
 if __name__ == '__main__':
+    # python run.py worker [N] - drain the delivery queue with N processes
+    if len(sys.argv) > 1 and sys.argv[1] == 'worker':
+        processes = int(sys.argv[2]) if len(sys.argv) > 2 else int(os.environ.get('DELIVERY_WORKERS', 2))
+        sys.exit(worker_main(processes))
+    
+    # python run.py scheduler - a scheduler node sharing the send job via SCHEDULER_SHARDS
+    if len(sys.argv) > 1 and sys.argv[1] == 'scheduler':
+        sys.exit(scheduler_main())
+    
     exit_code = main()
     sys.exit(exit_code)
@@ -4,153 +4,209 @@ from apscheduler.triggers.cron import CronTrigger
 import pytz
 from datetime import datetime, time
 import atexit
+import os
+
+# Users loaded, delivered and released per step of the send job
+USER_CHUNK_SIZE = int(os.environ.get('SCHEDULER_CHUNK_SIZE', 500))
+
+def iter_user_chunks(query, chunk_size=USER_CHUNK_SIZE):
+    """Keyset-paginate a User query by id, one short query per chunk.
+    
+    Each chunk is its own statement, so callers can commit and expunge between
+    chunks without holding a cursor open; yield_per bounds the row buffer.
+    """
+    from models import User
+    
+    last_id = 0
+    while True:
+        chunk = list(query.filter(User.id > last_id).order_by(User.id).limit(chunk_size).yield_per(chunk_size))
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+        yield chunk
 
 def send_daily_news(app):
     """Function to send daily news to users based on their preferred time and timezone"""
     with app.app_context():
         try:
             # Import inside function to avoid circular imports
-            from models import User, EmailLog
+            from models import User
             from app import db
             from news_service import NewsService
-            from email_service import send_news_email
+            from email_service import queue_news_email, delivery_error, PooledEmailSender
             from notification_service import NotificationService
+            from delivery_queue import queue_mode_enabled, enqueue_deliveries
+            from personalization import personalize_digests
+            from delivery_log import DeliveryRecorder
+            from sqlalchemy.orm import selectinload
+            from timezones import zone_table
+            from shard_leases import shard_count, node_id, claim_shards, renew_shards, shard_filter
+            
+            # Zones resolve once per process; local dates, slots and invalid-zone warnings once per tick
+            zone_table.start_tick()
             
             current_utc_time = datetime.now(pytz.UTC)
             print(f"📅 Checking for emails to send at {current_utc_time.strftime('%Y-%m-%d %H:%M:%S UTC')}")
             
-            # Get all active users
-            all_users = User.query.filter_by(is_active=True).all()
+            now = current_utc_time.replace(tzinfo=None)
             
-            if not all_users:
-                print("ℹ️  No active subscribers found")
-                return
+            # Sharded mode: only handle users in the hash ranges this node holds leases on
+            shard_clauses = ()
+            shards = None
+            total_shards = shard_count()
+            if total_shards:
+                owner = node_id()
+                shards = claim_shards(owner, total_shards)
+                if not shards:
+                    print(f"🧩 {owner} holds no shards this tick")
+                    return
+                print(f"🧩 {owner} owns shards {shards} of {total_shards}")
+                shard_clauses = (shard_filter(shards, total_shards),)
+            
+            # Backfill the send-slot index for users that don't have one yet
+            indexed = 0
+            for chunk in iter_user_chunks(User.query.filter(User.is_active == True, User.next_send_at.is_(None), *shard_clauses)):
+                for user in chunk:
+                    user.refresh_next_send_at(now)
+                db.session.commit()
+                db.session.expunge_all()
+                indexed += len(chunk)
+            if indexed:
+                print(f"🗂️  Indexed send slots for {indexed} users")
             
-            # Filter users who should receive emails at this exact time
-            users_to_email = []
-            for user in all_users:
-                # Handle invalid timezones
-                try:
-                    user_tz = pytz.timezone(user.timezone)
-                except pytz.UnknownTimeZoneError:
-                    user_tz = pytz.timezone('Asia/Kolkata')  # Default to IST
-                    print(f"⚠️  Invalid timezone '{user.timezone}' for {user.email}, using Asia/Kolkata")
-                
-                # Convert UTC to user's local time
-                user_local_time = current_utc_time.astimezone(user_tz)
-                
-                # Get user's preferred time (with defaults)
-                preferred_time = user.preferred_time or time(10, 0)  # Default 10:00 AM
-                
-                # FIX: Extract preferred time components properly
-                preferred_hour = preferred_time.hour
-                preferred_minute = preferred_time.minute
-                
-                # FIX: Compare time components directly
-                if user_local_time.hour == preferred_hour and user_local_time.minute == preferred_minute:
-                    # Verify frequency preference
-                    if user.should_receive_email_today():
-                        users_to_email.append(user)
-                        print(f"⏰ {user.email} triggered at local {user_local_time.strftime('%H:%M')} "
-                              f"(preferred: {preferred_hour:02d}:{preferred_minute:02d} {user_tz.zone})")
-                    else:
-                        print(f"ℹ️  Skipped {user.email} (already received email today)")
-            
-            if not users_to_email:
+            # Range query on the send-slot index for users due right now
+            due_filter = (User.is_active == True, User.next_send_at <= now, *shard_clauses)
+            if db.session.query(User.id).filter(*due_filter).first() is None:
                 print("ℹ️  No users scheduled for emails at this exact time")
                 return
             
-            print(f"👥 Found {len(users_to_email)} users to email out of {len(all_users)} total subscribers")
-            
-            # Fetch latest AI news
+            # Fetch latest AI news (shared by every send slot through the digest cache)
             news_service = NewsService()
-            print("📡 Fetching news articles...")
-            news_articles = news_service.fetch_ai_news()
+            print("📡 Loading news digest...")
+            news_articles = news_service.get_cached_digest()
             
             if not news_articles:
                 print("⚠️  No news articles from API, using fallback")
                 news_articles = news_service.get_fallback_news()
             
-            print(f"📰 Sending {len(news_articles)} articles to {len(users_to_email)} subscribers")
+            queue_mode = queue_mode_enabled()
+            notification_service = None if queue_mode else NotificationService()
             
-            # Initialize notification service
-            notification_service = NotificationService()
+            # Deliver over a few persistent SMTP connections instead of one per email
+            email_sender = None if queue_mode else PooledEmailSender(app).start()
             
             # Track email sending
             successful_sends = 0
             failed_sends = 0
+            users_emailed = 0
+            cohort_rankings = {}
             
-            # Send emails and notifications to all users
-            for user in users_to_email:
-                try:
-                    print(f"📧 Processing user: {user.email}...")
-                    
-                    # Limit articles based on user preference
-                    user_articles = news_articles[:user.max_articles]
-                    print(f"📊 Sending {len(user_articles)} articles to {user.email} (user limit: {user.max_articles})")
-                    
-                    # Send email (existing functionality)
-                    email_success = send_news_email(user.email, user_articles)
+            due_users_query = User.query.options(
+                selectinload(User.preferences),
+                selectinload(User.notification_channels)
+            ).filter(*due_filter)
+            
+            try:
+                # Stream due users in chunks; each chunk is delivered, recorded and released before the next loads
+                for due_users in iter_user_chunks(due_users_query):
+                    # Stop if a lease was lost; the new owner picks up the remaining users
+                    if shards and renew_shards(owner, shards) != shards:
+                        print(f"⚠️  {owner} lost a shard lease, leaving the rest of this tick to its new owner")
+                        break
                     
-                    # Send to other notification channels (Slack, Teams, etc.)
-                    notification_results = notification_service.send_notifications_to_user(user, user_articles)
+                    # Verify frequency preference and advance every due user to their next slot
+                    users_to_email = []
+                    scheduled_slots = {}
+                    for user in due_users:
+                        if user.should_receive_email_today():
+                            users_to_email.append(user)
+                            scheduled_slots[user.id] = user.next_send_at
+                            print(f"⏰ {user.email} triggered for slot {user.next_send_at.strftime('%H:%M')} UTC "
+                                  f"(preferred: {(user.preferred_time or time(10, 0)).strftime('%H:%M')} {user.timezone})")
+                        else:
+                            print(f"ℹ️  Skipped {user.email} (already received email today)")
+                        user.refresh_next_send_at(now)
                     
-                    # Log email attempt
-                    email_log = EmailLog(
-                        user_id=user.id,
-                        articles_count=len(news_articles),
-                        status='sent' if email_success else 'failed'
-                    )
+                    users_emailed += len(users_to_email)
+                    print(f"👥 Found {len(users_to_email)} users due for delivery in this chunk")
                     
-                    if email_success:
-                        successful_sends += 1
-                        user.last_email_sent = datetime.utcnow()
-                        print(f"✅ Email sent successfully to {user.email}")
-                    else:
-                        failed_sends += 1
-                        email_log.error_message = "Failed to send email"
-                        print(f"❌ Failed to send email to {user.email}")
+                    # Rank the digest once per (topics, priorities, max_articles) cohort, across chunks
+                    personalized_articles = personalize_digests(users_to_email, news_articles, cohort_rankings)
                     
-                    # Log notification results
-                    channels_sent = []
-                    for channel_type, result in notification_results.items():
-                        if result['sent']:
-                            channels_sent.append(channel_type)
+                    # Queue mode: hand deliveries to the worker processes
+                    if queue_mode:
+                        enqueue_deliveries(users_to_email, personalized_articles, scheduled_slots)
+                        db.session.commit()
+                        db.session.expunge_all()
+                        continue
                     
-                    if channels_sent:
-                        print(f"✅ Also sent to {user.email} via: {', '.join(channels_sent)}")
+                    # Queue emails and send notifications; delivery outcomes are recorded in chunks afterwards
+                    pending_deliveries = []
+                    recorder = DeliveryRecorder()
+                    for user in users_to_email:
+                        try:
+                            print(f"📧 Processing user: {user.email}...")
+                            
+                            # Digest ranked for the user's topic cohort, limited to their preference
+                            user_articles = personalized_articles[user.id]
+                            print(f"📊 Sending {len(user_articles)} articles to {user.email} (user limit: {user.max_articles})")
+                            
+                            # Queue email on the SMTP pool
+                            email_future = queue_news_email(user.email, user_articles, email_sender)
+                            pending_deliveries.append((user, user_articles, email_future))
+                            
+                        except Exception as e:
+                            failed_sends += 1
+                            print(f"❌ Error sending to {user.email}: {e}")
+                            recorder.record_email(user, 0, str(e), scheduled_slots.get(user.id))
                     
-                    db.session.add(email_log)
+                    # Fan out to other notification channels (Slack, Teams, etc.) while the SMTP pool drains
+                    notification_results = notification_service.send_notifications_to_users(
+                        [(user, user_articles) for user, user_articles, _ in pending_deliveries],
+                        recorder=recorder
+                    )
+                    for user, _, _ in pending_deliveries:
+                        channels_sent = [channel_type for channel_type, result in notification_results[user.id].items()
+                                         if result['sent']]
+                        if channels_sent:
+                            print(f"✅ Also sent to {user.email} via: {', '.join(channels_sent)}")
                     
-                except Exception as e:
-                    failed_sends += 1
-                    print(f"❌ Error sending to {user.email}: {e}")
+                    # Record the real outcome of every queued email in this chunk
+                    for user, user_articles, email_future in pending_deliveries:
+                        error = delivery_error(email_future)
+                        recorder.record_email(user, len(user_articles), error, scheduled_slots.get(user.id))
+                        
+                        if error:
+                            failed_sends += 1
+                            print(f"❌ Failed to send email to {user.email}: {error}")
+                        else:
+                            successful_sends += 1
                     
-                    # Log the error
+                    # Bulk-insert email logs and stamp sent users/channels, then release the chunk
                     try:
-                        error_log = EmailLog(
-                            user_id=user.id,
-                            articles_count=len(news_articles),
-                            status='failed',
-                            error_message=str(e)
-                        )
-                        db.session.add(error_log)
-                    except Exception as log_error:
-                        print(f"❌ Error logging failure: {log_error}")
-            
-            # Commit all changes
-            try:
-                db.session.commit()
-                print("💾 Database updated successfully")
-            except Exception as e:
-                print(f"❌ Error committing to database: {e}")
-                db.session.rollback()
+                        recorder.flush()
+                        db.session.commit()  # Slot refreshes of users with nothing to record
+                        print("💾 Database updated successfully")
+                    except Exception as e:
+                        print(f"❌ Error committing to database: {e}")
+                        db.session.rollback()
+                    db.session.expunge_all()
+            finally:
+                # Wait for queued emails to go out before closing the connections
+                if email_sender:
+                    sender_stats = email_sender.close()
+                    print(f"📮 SMTP pool: {sender_stats['sent']} delivered, {sender_stats['failed']} failed, "
+                          f"{sender_stats['messages_per_second']} msg/s over {sender_stats['connections']} connections")
+            
+            if queue_mode:
+                print("=" * 60)
+                return
             
             print(f"📊 Email job completed at {datetime.utcnow()}:")
             print(f"   ✅ Successful sends: {successful_sends}")
             print(f"   ❌ Failed sends: {failed_sends}")
             print(f"   📰 Articles sent: {len(news_articles)}")
-            print(f"   👥 Users emailed: {len(users_to_email)}")
+            print(f"   👥 Users emailed: {users_emailed}")
             print("=" * 60)
             
         except Exception as e:
@@ -161,6 +217,29 @@ def send_daily_news(app):
             except Exception as rollback_error:
                 print(f"❌ Error during rollback: {rollback_error}")
 
+def refresh_dashboard(app):
+    """Refresh the materialized admin dashboard summary"""
+    with app.app_context():
+        try:
+            from stats_service import refresh_dashboard_summary
+            refresh_dashboard_summary()
+        except Exception as e:
+            print(f"❌ Error refreshing dashboard summary: {e}")
+            try:
+                from app import db
+                db.session.rollback()
+            except Exception as rollback_error:
+                print(f"❌ Error during rollback: {rollback_error}")
+
+def release_node_shards(app):
+    """Release this node's shard leases"""
+    with app.app_context():
+        try:
+            from shard_leases import node_id, release_shards
+            release_shards(node_id())
+        except Exception as e:
+            print(f"❌ Error releasing scheduler shards: {e}")
+
 def start_scheduler(app):
     """Start the background scheduler with user preference-based timing"""
     try:
@@ -181,8 +260,26 @@ def start_scheduler(app):
             coalesce=True
         )
         
+        # Keep the materialized admin dashboard counts fresh
+        scheduler.add_job(
+            func=lambda: refresh_dashboard(app),
+            trigger=CronTrigger(minute=f"*/{os.environ.get('DASHBOARD_REFRESH_MINUTES', 5)}"),
+            id='dashboard_summary_refresh',
+            name='Refresh materialized admin dashboard counts',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+        
         scheduler.start()
         
+        # Sharded mode: hand this node's shards back so the others take over right away
+        # (registered first, so it runs after the scheduler has shut down)
+        from shard_leases import shard_count
+        if shard_count():
+            atexit.register(lambda: release_node_shards(app))
+            print(f"🧩 Sharded mode: splitting users into {shard_count()} shards with other scheduler nodes")
+        
         # Ensure scheduler shuts down when application exits
         atexit.register(lambda: scheduler.shutdown())
         
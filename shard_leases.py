@@ -0,0 +1,111 @@
+# shard_leases.py - Lease rows that split the send job across scheduler nodes
+import os
+import math
+import socket
+from datetime import datetime, timedelta
+
+LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', 300))
+
+def shard_count():
+    """Number of user-id shards; 0 means a single unsharded scheduler"""
+    return int(os.environ.get('SCHEDULER_SHARDS', 0))
+
+def node_id():
+    """This scheduler node's lease owner name"""
+    return os.environ.get('SCHEDULER_NODE_ID') or f"{socket.gethostname()}:{os.getpid()}"
+
+def shard_filter(shards, count):
+    """User filter for the hash ranges a node owns"""
+    from models import User
+    return (User.id % count).in_(shards)
+
+def heartbeat(owner, now=None):
+    """Mark this node live so the others leave it a fair share; the caller commits"""
+    from models import SchedulerNode
+    from app import db
+
+    now = now or datetime.utcnow()
+    node = db.session.get(SchedulerNode, owner)
+    if node is None:
+        node = SchedulerNode(node_id=owner)
+        db.session.add(node)
+    node.last_seen = now
+
+def claim_shards(owner, count, lease_seconds=LEASE_SECONDS):
+    """Renew this node's shard leases and rebalance towards an even split.
+
+    Each live node (heartbeat within the lease window) targets ceil(count /
+    live nodes) shards: it releases any surplus and takes free or expired
+    shards up to its share. Shards are taken with a conditional UPDATE, so two
+    nodes racing for the same shard can never both own it.
+    """
+    from models import SchedulerShard, SchedulerNode
+    from app import db
+
+    now = datetime.utcnow()
+    leased_until = now + timedelta(seconds=lease_seconds)
+
+    existing = {row.shard_id for row in db.session.query(SchedulerShard.shard_id)}
+    missing = [shard for shard in range(count) if shard not in existing]
+    if missing:
+        try:
+            db.session.add_all([SchedulerShard(shard_id=shard) for shard in missing])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()  # Another node created them first
+
+    heartbeat(owner, now)
+    SchedulerNode.query.filter(SchedulerNode.last_seen < now - timedelta(seconds=lease_seconds * 10)).delete()
+    live_nodes = SchedulerNode.query.filter(SchedulerNode.last_seen >= now - timedelta(seconds=lease_seconds)).count()
+    fair_share = math.ceil(count / max(live_nodes, 1))
+
+    SchedulerShard.query.filter(SchedulerShard.lease_owner == owner).update(
+        {'leased_until': leased_until}, synchronize_session=False)
+    held = sorted(row.shard_id for row in db.session.query(SchedulerShard.shard_id).filter(
+        SchedulerShard.lease_owner == owner, SchedulerShard.shard_id < count))
+
+    if len(held) > fair_share:
+        surplus = held[fair_share:]
+        SchedulerShard.query.filter(SchedulerShard.lease_owner == owner, SchedulerShard.shard_id.in_(surplus)).update(
+            {'lease_owner': None, 'leased_until': None}, synchronize_session=False)
+        held = held[:fair_share]
+        print(f"🧩 {owner} released shards {surplus} to other nodes")
+    elif len(held) < fair_share:
+        claimable = db.or_(SchedulerShard.lease_owner.is_(None), SchedulerShard.leased_until < now)
+        free = [row.shard_id for row in db.session.query(SchedulerShard.shard_id)
+                .filter(claimable, SchedulerShard.shard_id < count).order_by(SchedulerShard.shard_id)]
+        for shard in free:
+            if len(held) >= fair_share:
+                break
+            won = SchedulerShard.query.filter(SchedulerShard.shard_id == shard, claimable).update(
+                {'lease_owner': owner, 'leased_until': leased_until}, synchronize_session=False)
+            if won:
+                held.append(shard)
+
+    db.session.commit()
+    return sorted(held)
+
+def renew_shards(owner, shards, lease_seconds=LEASE_SECONDS):
+    """Extend the leases mid-job; returns the shards this node still owns.
+
+    Runs on its own connection so the caller's session, and the chunk of users
+    loaded in it, is left alone.
+    """
+    from models import SchedulerShard
+    from app import db
+
+    leased_until = datetime.utcnow() + timedelta(seconds=lease_seconds)
+    owned = db.and_(SchedulerShard.lease_owner == owner, SchedulerShard.shard_id.in_(shards))
+    with db.engine.begin() as connection:
+        connection.execute(db.update(SchedulerShard).where(owned).values(leased_until=leased_until))
+        return sorted(connection.execute(db.select(SchedulerShard.shard_id).where(owned)).scalars())
+
+def release_shards(owner):
+    """Hand this node's shards back on shutdown instead of waiting for the leases to expire"""
+    from models import SchedulerShard, SchedulerNode
+    from app import db
+
+    SchedulerShard.query.filter(SchedulerShard.lease_owner == owner).update(
+        {'lease_owner': None, 'leased_until': None}, synchronize_session=False)
+    SchedulerNode.query.filter(SchedulerNode.node_id == owner).delete()
+    db.session.commit()
@@ -0,0 +1,146 @@
+# stats_service.py - Cached dashboard statistics snapshot
+import os
+import json
+import hashlib
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload
+
+# Writes to these tables make the cached snapshot stale
+TRACKED_MODELS = ('User', 'Topic', 'NewsArticle', 'UserPreference')
+
+class StatsCache:
+    """In-memory /api/stats snapshot with a short TTL, invalidated on ORM writes.
+
+    The snapshot keeps the encoded JSON body and its ETag so repeat hits are
+    answered without touching the database or re-serializing.
+    """
+
+    def __init__(self, ttl_seconds=30):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._snapshot = None
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+
+    def get(self):
+        """Return (body, etag, last_modified), recomputing if stale"""
+        with self._lock:
+            snapshot = self._snapshot
+            generation = self._generation
+        if snapshot and snapshot['generation'] == generation and \
+                time.monotonic() - snapshot['computed_at'] < self.ttl_seconds:
+            return snapshot['body'], snapshot['etag'], snapshot['last_modified']
+
+        body = json.dumps({'success': True, 'stats': compute_stats()}).encode('utf-8')
+        snapshot = {
+            'body': body,
+            'etag': hashlib.sha1(body).hexdigest(),
+            'last_modified': datetime.utcnow().replace(microsecond=0),
+            'computed_at': time.monotonic(),
+            'generation': generation
+        }
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot['body'], snapshot['etag'], snapshot['last_modified']
+
+def compute_stats():
+    """Run the dashboard queries"""
+    from models import User, Topic, NewsArticle
+    from app import db
+
+    total_subscribers = User.query.filter_by(is_active=True).count()
+    total_topics = Topic.query.filter_by(is_active=True).count()
+
+    # Get articles from today
+    today = datetime.utcnow().date()
+    today_start = datetime.combine(today, datetime.min.time())
+    today_end = datetime.combine(today, datetime.max.time())
+    daily_articles = NewsArticle.query.filter(
+        NewsArticle.date_fetched >= today_start,
+        NewsArticle.date_fetched <= today_end
+    ).count()
+
+    # Get average articles per user based on user preferences
+    avg_articles_result = db.session.query(db.func.avg(User.max_articles)).filter_by(is_active=True).scalar()
+    avg_articles_per_user = int(avg_articles_result) if avg_articles_result else 5
+
+    # Get recent articles with their topics in the same query
+    recent_articles = NewsArticle.query.options(joinedload(NewsArticle.topic))\
+        .order_by(NewsArticle.date_fetched.desc()).limit(3).all()
+
+    # Format articles for frontend
+    articles_data = []
+    for article in recent_articles:
+        articles_data.append({
+            'id': article.id,
+            'title': article.title,
+            'description': article.description or article.summary,
+            'url': article.url,
+            'source': article.source,
+            'published_at': article.published_at.isoformat() if article.published_at else None,
+            'topic_name': article.topic.name if article.topic else None,
+            'category': article.topic.name if article.topic else 'General'
+        })
+
+    return {
+        'total_subscribers': total_subscribers,
+        'total_topics': total_topics,
+        'daily_articles': daily_articles,
+        'avg_articles_per_user': avg_articles_per_user,
+        'recent_articles': articles_data
+    }
+
+stats_cache = StatsCache(ttl_seconds=int(os.environ.get('STATS_CACHE_TTL', 30)))
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_on_write(session, flush_context):
+    """Drop the snapshot when subscribers, topics or articles change"""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if type(obj).__name__ in TRACKED_MODELS:
+            stats_cache.invalidate()
+            return
+
+@event.listens_for(Session, 'after_bulk_update')
+@event.listens_for(Session, 'after_bulk_delete')
+def _invalidate_on_bulk_write(context):
+    """Query.update()/delete() bypass the flush, so invalidate on every bulk write"""
+    stats_cache.invalidate()
+
+def refresh_dashboard_summary():
+    """Recompute the materialized admin dashboard counts"""
+    from models import User, Topic, NewsArticle, UserPreference, DashboardSummary, TopicSubscriberCount
+    from app import db
+
+    now = datetime.utcnow()
+
+    # All four table counts in one round trip
+    totals = db.session.query(
+        db.session.query(db.func.count(User.id)).scalar_subquery(),
+        db.session.query(db.func.count(User.id)).filter(User.is_active == True).scalar_subquery(),
+        db.session.query(db.func.count(Topic.id)).filter(Topic.is_active == True).scalar_subquery(),
+        db.session.query(db.func.count(NewsArticle.id)).scalar_subquery()
+    ).one()
+
+    summary = db.session.get(DashboardSummary, 1) or DashboardSummary(id=1)
+    summary.total_users, summary.active_users, summary.total_topics, summary.total_articles = totals
+    summary.refreshed_at = now
+    db.session.add(summary)
+
+    topic_counts = dict(db.session.query(UserPreference.topic_id, db.func.count(UserPreference.id))
+                        .filter(UserPreference.is_active == True)
+                        .group_by(UserPreference.topic_id).all())
+    TopicSubscriberCount.query.delete()
+    db.session.add_all([
+        TopicSubscriberCount(topic_id=topic_id, subscriber_count=count, refreshed_at=now)
+        for topic_id, count in topic_counts.items()
+    ])
+
+    db.session.commit()
+    print(f"📈 Dashboard summary refreshed ({summary.total_users} users, {len(topic_counts)} topics)")
+    return summary
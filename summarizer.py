@@ -1,25 +1,72 @@
 # summarizer.py - Gemini Version
 import os
+import re
 import google.generativeai as genai
 from newspaper import Article
+from newspaper.network import get_html_2XX_only
 import requests
 from datetime import datetime
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import threading
 import time
+from summary_cache import summary_cache
+from http_client import get_session
 
 # Configuration
 GEMINI_API_KEY = os.environ.get('')
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
+# Cached summaries are only reused for the same model and prompt version
+GEMINI_MODEL = 'gemini-1.5-flash'
+PROMPT_VERSION = 'bullets-v2'  # v2: batch requests see the same 4000 chars of text as single ones
+SUMMARY_MAX_CHARS = 4000  # Article text sent to Gemini, in single and batch requests alike
+
+class HostRateLimiter:
+    """Per-host politeness limit: bounded concurrency and a minimum gap between requests"""
+    
+    def __init__(self, max_per_host=1, min_interval=0.5):
+        self.max_per_host = max_per_host
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_slot = {}
+    
+    @contextmanager
+    def slot(self, url):
+        """Hold a request slot for the URL's host, waiting out the politeness gap"""
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(self.max_per_host))
+        
+        with semaphore:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_slot.get(host, now))
+                self._next_slot[host] = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+# Shared by every summarizer so concurrent downloads stay polite per host
+host_limiter = HostRateLimiter(
+    max_per_host=int(os.environ.get('NEWS_FETCH_PER_HOST', 1)),
+    min_interval=float(os.environ.get('NEWS_FETCH_HOST_INTERVAL', 0.5))
+)
+
 class NewsSummarizer:
     def __init__(self):
         self.use_gemini = bool(GEMINI_API_KEY)
         self.model = None
+        self.cache = summary_cache
+        self.batch_mode = os.environ.get('GEMINI_BATCH_MODE', 'true').lower() == 'true'
+        self.batch_size = int(os.environ.get('GEMINI_BATCH_SIZE', 5))
         
         if self.use_gemini:
             try:
                 # Use Gemini 1.5 Flash for fast, cost-effective summarization
-                self.model = genai.GenerativeModel('gemini-1.5-flash')
+                self.model = genai.GenerativeModel(GEMINI_MODEL)
                 print("✅ Gemini AI initialized successfully")
             except Exception as e:
                 print(f"⚠️ Gemini initialization failed: {e}")
@@ -30,8 +77,16 @@ class NewsSummarizer:
         try:
             print(f"📰 Extracting text from: {url[:50]}...")
             
+            # Download over the shared keep-alive pool, then hand the HTML to newspaper3k
             article = Article(url)
-            article.download()
+            with host_limiter.slot(url):
+                response = get_session().get(
+                    url,
+                    headers={'User-Agent': article.config.browser_user_agent},
+                    timeout=article.config.request_timeout
+                )
+                response.raise_for_status()
+            article.download(input_html=get_html_2XX_only(url, article.config, response=response))
             article.parse()
             
             # Validate extracted content
@@ -71,7 +126,7 @@ class NewsSummarizer:
         # Rough estimation: ~4 characters per token
         return len(text) // 4
     
-    def summarize_with_gemini(self, text, max_chars=4000):
+    def summarize_with_gemini(self, text, max_chars=SUMMARY_MAX_CHARS):
         """Summarize text using Google Gemini"""
         try:
             # Truncate text if too long (Gemini 1.5 Flash can handle large texts, but let's be safe)
@@ -132,6 +187,85 @@ Article to summarize:
             time.sleep(1)
             return self.fallback_summary(text), 0
     
+    def summarize_batch_with_gemini(self, texts, max_chars=SUMMARY_MAX_CHARS):
+        """Summarize several articles in one Gemini request.
+        
+        Returns one (summary, tokens) tuple per text, or None where the article's
+        bullets could not be parsed out of the response.
+        """
+        truncated = [text[:max_chars] + "..." if len(text) > max_chars else text for text in texts]
+        
+        articles_block = "\n\n".join(
+            f"=== ARTICLE {i} ===\n{text}" for i, text in enumerate(truncated, 1)
+        )
+        prompt = f"""
+Please summarize each of the following {len(truncated)} news articles in exactly 3 bullet points.
+Each bullet point should be:
+- Maximum 25 words
+- Focus on key facts and important information
+- Written in clear, concise language
+- Start with a bullet point symbol (•)
+
+Format your response exactly like this, with one section per article in order:
+### 1
+• [First key point about article 1]
+• [Second important detail or development]
+• [Third significant fact or implication]
+### 2
+• ...
+
+Articles to summarize:
+{articles_block}
+"""
+        
+        try:
+            print(f"🤖 Generating {len(truncated)} summaries with one Gemini request...")
+            
+            response = self.model.generate_content(
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    candidate_count=1,
+                    max_output_tokens=150 * len(truncated) + 50,
+                    temperature=0.3,
+                )
+            )
+            
+            if not (response.candidates and response.candidates[0].content):
+                print("⚠️ Gemini returned empty batch response")
+                return [None] * len(truncated)
+            
+            sections = self._split_batch_response(response.candidates[0].content.parts[0].text)
+            
+            results = []
+            for i, text in enumerate(truncated, 1):
+                section = sections.get(i)
+                summary = self._clean_summary(section) if section else None
+                if not summary or not summary.startswith('•'):
+                    results.append(None)
+                    continue
+                tokens = self.count_tokens_estimate(text) + self.count_tokens_estimate(summary)
+                results.append((summary, tokens))
+            
+            print(f"✅ Batch summary parsed for {len([r for r in results if r])}/{len(truncated)} articles")
+            return results
+        
+        except Exception as e:
+            print(f"❌ Gemini batch summarization error: {e}")
+            return [None] * len(truncated)
+    
+    def _split_batch_response(self, text):
+        """Split a batch response into {article number: section text}"""
+        sections = {}
+        current = None
+        for line in text.split('\n'):
+            match = re.match(r'^\s*#{2,4}\s*(?:ARTICLE\s*)?(\d+)\s*$', line, re.IGNORECASE)
+            if match:
+                current = int(match.group(1))
+                sections[current] = []
+            elif current is not None and line.strip():
+                sections[current].append(line.strip())
+        return {number: '\n'.join(lines) for number, lines in sections.items() if lines}
+    
     def _clean_summary(self, summary):
         """Clean and format the Gemini response"""
         lines = summary.split('\n')
@@ -178,8 +312,13 @@ Article to summarize:
             print(f"❌ Fallback summary error: {e}")
             return '• Summary not available for this article.\n• Please click the link to read the full content.\n• Automatic summarization encountered an error.'
     
-    def summarize_article(self, url, existing_text=None):
-        """Main method to extract and summarize article"""
+    def prepare_article(self, url, existing_text=None):
+        """Extract an article and resolve its summary from cache.
+        
+        Returns (result, article_text). article_text is None when the result is
+        already complete (cache hit or failed extraction); otherwise the text
+        still has to be summarized with complete_article or summarize_batch.
+        """
         result = {
             'url': url,
             'extraction_status': 'pending',
@@ -189,6 +328,19 @@ Article to summarize:
             'error': None
         }
         
+        # A URL we already summarized costs no download and no LLM call
+        if self.use_gemini and not existing_text:
+            cached = self.cache.get_by_url(url, GEMINI_MODEL, PROMPT_VERSION)
+            if cached:
+                print(f"🗃️  Summary cache hit for {url[:50]}...")
+                result.update({
+                    'extraction_status': 'success',
+                    'full_text': cached['full_text'],
+                    'summary': cached['summary'],
+                    'summary_tokens': cached['summary_tokens']
+                })
+                return result, None
+        
         # Extract text if not provided
         if existing_text:
             article_text = existing_text
@@ -205,11 +357,28 @@ Article to summarize:
                 result['error'] = extracted.get('error', 'Failed to extract text')
                 # Still try to create a fallback summary from description
                 result['summary'] = self.fallback_summary("Article content not available")
-                return result
+                return result, None
         
-        # Summarize the text
+        # Syndicated copies of the same text share one summary
+        if self.use_gemini and len(article_text.strip()) > 50:
+            cached = self.cache.get_by_content(article_text, GEMINI_MODEL, PROMPT_VERSION, url=url)
+            if cached:
+                print(f"🗃️  Summary cache hit (same content) for {url[:50]}...")
+                result['summary'] = cached['summary']
+                result['summary_tokens'] = cached['summary_tokens']
+                return result, None
+        
+        return result, article_text
+    
+    def complete_article(self, result, article_text):
+        """Summarize one prepared article with its own Gemini call"""
         if self.use_gemini and len(article_text.strip()) > 50:
             summary, tokens = self.summarize_with_gemini(article_text)
+            
+            # Only real Gemini summaries are cached; fallbacks report zero tokens
+            if tokens:
+                self.cache.put(result['url'], article_text, GEMINI_MODEL, PROMPT_VERSION,
+                               summary, tokens, result['full_text'])
         else:
             summary = self.fallback_summary(article_text)
             tokens = self.count_tokens_estimate(article_text)
@@ -218,6 +387,44 @@ Article to summarize:
         result['summary_tokens'] = tokens
         
         return result
+    
+    def summarize_article(self, url, existing_text=None):
+        """Main method to extract and summarize article"""
+        result, article_text = self.prepare_article(url, existing_text)
+        if article_text is not None:
+            self.complete_article(result, article_text)
+        return result
+    
+    def summarize_batch(self, prepared):
+        """Summarize prepared (result, article_text) pairs with as few Gemini requests as possible.
+        
+        Articles are packed batch_size at a time into one prompt; any article whose
+        bullets can't be parsed back out falls back to its own request.
+        """
+        pending = [(result, text) for result, text in prepared if text is not None]
+        
+        if not self.use_gemini or len(pending) < 2:
+            for result, text in pending:
+                self.complete_article(result, text)
+            return [result for result, _ in prepared]
+        
+        for start in range(0, len(pending), self.batch_size):
+            chunk = pending[start:start + self.batch_size]
+            batch_results = self.summarize_batch_with_gemini([text for _, text in chunk])
+            
+            for (result, text), batch_result in zip(chunk, batch_results):
+                if batch_result is None:
+                    print(f"⚠️  Batch summary missing for {result['url'][:50]}..., retrying individually")
+                    self.complete_article(result, text)
+                    continue
+                
+                summary, tokens = batch_result
+                result['summary'] = summary
+                result['summary_tokens'] = tokens
+                self.cache.put(result['url'], text, GEMINI_MODEL, PROMPT_VERSION,
+                               summary, tokens, result['full_text'])
+        
+        return [result for result, _ in prepared]
 
 # Test function
 def test_gemini_summarizer():
@@ -0,0 +1,179 @@
+# summary_cache.py - Content-addressed cache for Gemini summaries
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'summary_cache.db')
+
+# Query parameters that never change the article content
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'cmpid')
+
+def normalize_url(url):
+    """Normalize a URL so trivially different links to the same article share a key"""
+    parsed = urlparse(url.strip())
+    query = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ]
+    path = parsed.path.rstrip('/') or '/'
+    netloc = parsed.netloc.lower()
+    if netloc.startswith('www.'):
+        netloc = netloc[4:]
+    return urlunparse((parsed.scheme.lower(), netloc, path, '', urlencode(sorted(query)), ''))
+
+# Length of the stored URL columns (NewsArticle, ArticleSignature)
+URL_MAX_LENGTH = 500
+
+def url_key(url):
+    """A URL as the database stores it; look stored rows up through this, never by the raw URL"""
+    return url[:URL_MAX_LENGTH]
+
+def content_hash(text):
+    """Hash extracted article text, ignoring whitespace differences"""
+    normalized = ' '.join(text.split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+class SummaryCache:
+    """Persistent summary cache keyed by normalized URL and by extracted-text hash.
+
+    Entries record the model and prompt version they were produced with and only
+    match lookups for the same pair. Entries expire after a TTL and the least
+    recently used ones are evicted once the cache grows past max_entries.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=7 * 24 * 3600, max_entries=5000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.url_hits = 0
+        self.content_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            if self.path != ':memory:':
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    url_key TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    summary_tokens INTEGER DEFAULT 0,
+                    full_text TEXT,
+                    created_at REAL NOT NULL,
+                    last_used_at REAL NOT NULL,
+                    PRIMARY KEY (url_key, model, prompt_version)
+                )
+            """)
+            self._conn.execute('CREATE INDEX IF NOT EXISTS ix_summaries_content ON summaries (content_hash, model, prompt_version)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS ix_summaries_last_used ON summaries (last_used_at)')
+            self._conn.commit()
+        return self._conn
+
+    def _lookup(self, column, key, model, prompt_version):
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            f'SELECT url_key, summary, summary_tokens, full_text FROM summaries '
+            f'WHERE {column} = ? AND model = ? AND prompt_version = ? AND created_at > ? LIMIT 1',
+            (key, model, prompt_version, now - self.ttl_seconds)
+        ).fetchone()
+        if row:
+            conn.execute(
+                'UPDATE summaries SET last_used_at = ? WHERE url_key = ? AND model = ? AND prompt_version = ?',
+                (now, row[0], model, prompt_version)
+            )
+            conn.commit()
+            return {'summary': row[1], 'summary_tokens': row[2], 'full_text': row[3]}
+        return None
+
+    def get_by_url(self, url, model, prompt_version):
+        """Look up a summary by article URL; doesn't count a miss since a content lookup may follow"""
+        try:
+            with self._lock:
+                entry = self._lookup('url_key', normalize_url(url), model, prompt_version)
+                if entry:
+                    self.hits += 1
+                    self.url_hits += 1
+                return entry
+        except sqlite3.Error as e:
+            print(f"⚠️  Summary cache lookup failed: {e}")
+            return None
+
+    def get_by_content(self, text, model, prompt_version, url=None):
+        """Look up a summary by extracted text, linking the URL to it on a hit"""
+        try:
+            with self._lock:
+                digest = content_hash(text)
+                entry = self._lookup('content_hash', digest, model, prompt_version)
+                if entry:
+                    self.hits += 1
+                    self.content_hits += 1
+                    if url:
+                        self._store(url, digest, model, prompt_version, entry['summary'],
+                                    entry['summary_tokens'], entry['full_text'])
+                else:
+                    self.misses += 1
+                return entry
+        except sqlite3.Error as e:
+            print(f"⚠️  Summary cache lookup failed: {e}")
+            return None
+
+    def put(self, url, text, model, prompt_version, summary, summary_tokens=0, full_text=None):
+        """Store a freshly generated summary under both its URL and content hash"""
+        try:
+            with self._lock:
+                self._store(url, content_hash(text), model, prompt_version, summary, summary_tokens, full_text)
+                self._evict()
+        except sqlite3.Error as e:
+            print(f"⚠️  Summary cache write failed: {e}")
+
+    def _store(self, url, digest, model, prompt_version, summary, summary_tokens, full_text):
+        now = time.time()
+        conn = self._connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO summaries '
+            '(url_key, content_hash, model, prompt_version, summary, summary_tokens, full_text, created_at, last_used_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (normalize_url(url), digest, model, prompt_version, summary, summary_tokens, full_text, now, now)
+        )
+        conn.commit()
+
+    def _evict(self):
+        conn = self._connection()
+        conn.execute('DELETE FROM summaries WHERE created_at <= ?', (time.time() - self.ttl_seconds,))
+        count = conn.execute('SELECT COUNT(*) FROM summaries').fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                'DELETE FROM summaries WHERE rowid IN '
+                '(SELECT rowid FROM summaries ORDER BY last_used_at LIMIT ?)',
+                (count - self.max_entries,)
+            )
+        conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'url_hits': self.url_hits,
+            'content_hits': self.content_hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+# Shared process-wide so every NewsSummarizer reuses the same cache and counters
+summary_cache = SummaryCache(
+    path=os.environ.get('SUMMARY_CACHE_PATH', DEFAULT_CACHE_PATH),
+    ttl_seconds=int(os.environ.get('SUMMARY_CACHE_TTL_HOURS', 168)) * 3600,
+    max_entries=int(os.environ.get('SUMMARY_CACHE_MAX_ENTRIES', 5000))
+)
@@ -0,0 +1,80 @@
+# test_delivery_queue.py
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+def test_delivery_queue():
+    """Jobs are leased to one worker at a time, retried with backoff and logged once final"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'queue.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    try:
+        from app import create_app, db
+        app = create_app()
+    finally:
+        os.environ.pop('DATABASE_URL')
+
+    from models import User, EmailLog, DeliveryJob, NotificationChannel
+    from delivery_queue import enqueue_deliveries, claim_jobs, complete_job
+
+    with app.app_context():
+        print("🧪 Testing durable delivery queue")
+        print("=" * 60)
+
+        users = [User(email=f'reader{i}@example.com') for i in range(4)]
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add(NotificationChannel(user_id=users[0].id, channel_type='slack',
+                                           webhook_url='https://hooks.slack.com/services/T/B/X'))
+        db.session.commit()
+
+        articles = [{'title': 'Queued Article', 'url': 'https://example.com/q', 'description': 'd'}]
+        enqueue_deliveries(users, articles)
+        db.session.commit()
+        assert DeliveryJob.query.count() == 5  # 4 emails + 1 slack
+
+        # Two workers never receive the same job
+        first = claim_jobs('worker-a', limit=3)
+        second = claim_jobs('worker-b', limit=10)
+        assert len(first) == 3 and len(second) == 2
+        assert not {job.id for job in first} & {job.id for job in second}
+        assert claim_jobs('worker-c') == []
+
+        # An expired lease makes the job claimable again, counting the lost run as an attempt
+        stuck = first[0]
+        stuck.leased_until = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        reclaimed = claim_jobs('worker-c')
+        assert [job.id for job in reclaimed] == [stuck.id]
+        assert stuck.attempts == 1 and stuck.lease_owner == 'worker-c'
+
+        # The worker that lost the lease cannot complete the job any more
+        assert complete_job(stuck, worker_id='worker-a') is None
+        db.session.commit()
+        db.session.refresh(stuck)
+        assert stuck.status == 'leased' and stuck.lease_owner == 'worker-c' and stuck.attempts == 1
+
+        # Failures back off and are retried until attempts run out, then logged
+        job = stuck
+        while job.status != 'failed':
+            log = complete_job(job, 'SMTP down', 'worker-c')
+            if log:
+                db.session.add(log)
+            if job.status == 'pending':
+                job.available_at = datetime.utcnow()
+            db.session.commit()
+            if job.status == 'pending':
+                assert [claimed.id for claimed in claim_jobs('worker-c')] == [job.id]
+        assert job.attempts == job.max_attempts
+        assert EmailLog.query.filter_by(user_id=job.user_id, status='failed').count() == 1
+
+        # A successful email job is logged and stamps the user
+        done = next(job for job in second if job.channel == 'email')
+        db.session.add(complete_job(done, worker_id='worker-b'))
+        db.session.commit()
+        assert done.status == 'done'
+        assert done.user.last_email_sent is not None
+
+        print("✅ Leasing, lease expiry, retries and logging behave as expected")
+
+if __name__ == '__main__':
+    test_delivery_queue()
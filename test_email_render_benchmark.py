@@ -0,0 +1,67 @@
+# test_email_render_benchmark.py
+from app import create_app
+from flask import render_template
+from email_service import render_digest_html
+from datetime import datetime
+import time
+
+def sample_articles(count=8):
+    """Digest-sized article list with summaries"""
+    return [
+        {
+            'title': f'AI Breakthrough #{i}: New Model Sets Benchmark Records',
+            'url': f'https://example.com/ai-news/{i}',
+            'description': 'Researchers report a new model architecture that improves reasoning and efficiency across a wide range of benchmarks.',
+            'summary': '• New architecture improves reasoning benchmarks by a wide margin\n• Training cost reduced significantly compared to previous models\n• Release planned for developers later this year',
+            'source': 'AI Research Weekly',
+            'published_at': '2026-01-15T09:30:00Z',
+            'extraction_status': 'success',
+            'summary_tokens': 60
+        }
+        for i in range(count)
+    ]
+
+def test_email_render_benchmark(recipients=200):
+    """Personalized digest HTML matches a full render, and costs far less per recipient"""
+    app = create_app()
+
+    with app.test_request_context():
+        print("🧪 Benchmarking digest email rendering")
+        print("=" * 60)
+
+        articles = sample_articles()[:5]
+        current_date = datetime.now().strftime('%A, %B %d, %Y')
+        emails = [f'reader{i}+ai@example.com' for i in range(recipients)]
+
+        # Personalized output must be identical to rendering the template for that user
+        for user_email in emails[:3]:
+            expected = render_template('email_template.html',
+                                       articles=articles,
+                                       user_email=user_email,
+                                       current_date=current_date,
+                                       preview=False)
+            assert render_digest_html(user_email, articles, current_date) == expected
+
+        start = time.perf_counter()
+        for user_email in emails:
+            render_template('email_template.html',
+                            articles=articles,
+                            user_email=user_email,
+                            current_date=current_date,
+                            preview=False)
+        full_render = (time.perf_counter() - start) / recipients
+
+        start = time.perf_counter()
+        for user_email in emails:
+            render_digest_html(user_email, articles, current_date)
+        cached_render = (time.perf_counter() - start) / recipients
+
+        print(f"📊 Per-recipient render cost over {recipients} recipients:")
+        print(f"   🐢 render_template:    {full_render * 1e6:8.1f} µs")
+        print(f"   🚀 render_digest_html: {cached_render * 1e6:8.1f} µs")
+        print(f"   ⚡ Speedup: {full_render / cached_render:.1f}x")
+
+        assert cached_render < full_render
+
+if __name__ == '__main__':
+    test_email_render_benchmark(recipients=2000)
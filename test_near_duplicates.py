@@ -0,0 +1,77 @@
+# test_near_duplicates.py
+import os
+import tempfile
+from near_duplicates import NearDuplicateDetector, simhash
+
+def article(url, title, description=''):
+    return {'url': url, 'title': title, 'description': description}
+
+def test_near_duplicates():
+    """Syndicated copies collapse into one story; unrelated or featureless articles never do"""
+    print("🧪 Testing near-duplicate detection")
+    print("=" * 60)
+
+    detector = NearDuplicateDetector()
+
+    # A lightly rewritten copy collapses into the first article
+    story = 'OpenAI releases a new reasoning model that beats previous benchmarks on math and coding tasks'
+    copies = [
+        article('https://a.example.com/1', story, 'The model is available to developers through the API starting today'),
+        article('https://b.example.com/1', story + '.', 'The model is available to developers through the API starting today.'),
+        article('https://c.example.com/1', 'Robotics startup raises funding for warehouse automation',
+                'Investors back a company building autonomous picking robots for logistics centers')
+    ]
+    representatives = detector.collapse(copies)
+    assert [item['url'] for item in representatives] == ['https://a.example.com/1', 'https://c.example.com/1']
+    assert representatives[0]['duplicate_urls'] == ['https://b.example.com/1']
+
+    # Non-ASCII stories get real fingerprints and stay apart
+    foreign = [
+        article('https://ru.example.com/1', 'Новая модель искусственного интеллекта', 'Компания представила языковую модель для врачей'),
+        article('https://ru.example.com/2', 'Центральный банк сохранил ключевую ставку', 'Решение совета директоров объявлено в пятницу'),
+        article('https://zh.example.com/1', '人工智能 公司 发布 新 模型', '研究人员 表示 性能 大幅 提升')
+    ]
+    assert all(simhash(f"{item['title']} {item['description']}") for item in foreign)
+    assert len(detector.collapse(foreign)) == 3
+
+    # Articles with too little text to fingerprint pass through untouched
+    featureless = [article('https://x.example.com/1', '!!!'), article('https://x.example.com/2', '???'),
+                   article('https://x.example.com/3', 'AI')]
+    assert simhash('!!!') is None
+    representatives = detector.collapse(featureless)
+    assert len(representatives) == 3
+    assert not any('duplicate_urls' in item for item in representatives)
+
+    print("✅ Near-duplicate detection test passed")
+
+def test_near_duplicates_persisted():
+    """Stored signatures match later runs, including URLs longer than the column"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'signatures.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    try:
+        from app import create_app
+        app = create_app()
+    finally:
+        os.environ.pop('DATABASE_URL')
+
+    from models import ArticleSignature
+
+    long_url = 'https://news.example.com/story?' + 'x' * 600
+    story = article(long_url, 'Chip maker unveils accelerator for training large language models',
+                    'The new accelerator doubles memory bandwidth for data center workloads')
+    copy = article('https://mirror.example.com/chip', story['title'], story['description'])
+
+    with app.app_context():
+        detector = NearDuplicateDetector()
+        assert detector.collapse([dict(story)]) == [story]
+
+        # The same article again is still kept, and a syndicated copy is dropped
+        representatives = detector.collapse([dict(story), dict(copy)])
+        assert [item['url'] for item in representatives] == [long_url]
+        assert representatives[0]['duplicate_urls'] == [copy['url']]
+        assert ArticleSignature.query.count() == 2
+        assert {row.url for row in ArticleSignature.query} == {long_url[:500], copy['url']}
+
+if __name__ == '__main__':
+    test_near_duplicates()
+    test_near_duplicates_persisted()
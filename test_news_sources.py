@@ -0,0 +1,159 @@
+# test_news_sources.py
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RSS_FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
+  <channel>
+    <title>AI Lab Blog</title>
+    <link>https://ailab.example.com</link>
+    <item>
+      <title>New &lt;b&gt;transformer&lt;/b&gt; release</title>
+      <link>https://ailab.example.com/posts/transformer?utm_source=rss</link>
+      <description>&lt;p&gt;A faster transformer for long documents.&lt;/p&gt;</description>
+      <pubDate>{recent_rfc822}</pubDate>
+    </item>
+    <item>
+      <title>Robotics grasping benchmark</title>
+      <link>https://ailab.example.com/posts/grasping</link>
+      <description>Robots learn to grasp unseen objects.</description>
+      <pubDate>{older_rfc822}</pubDate>
+    </item>
+    <item>
+      <title>Broken link</title>
+      <link>http://[abc</link>
+      <description>Malformed URLs are skipped, not fatal.</description>
+      <pubDate>{recent_rfc822}</pubDate>
+    </item>
+    <item>
+      <title>Archive post</title>
+      <link>https://ailab.example.com/posts/archive</link>
+      <description>Too old for today's digest.</description>
+      <pubDate>{stale_rfc822}</pubDate>
+    </item>
+  </channel>
+</rss>
+"""
+
+ATOM_FEED = """<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>Research Digest</title>
+  <entry>
+    <title>Diffusion models for protein design</title>
+    <link rel="alternate" href="https://research.example.org/diffusion-proteins"/>
+    <summary>Generative models design new proteins.</summary>
+    <updated>{newest_iso}</updated>
+  </entry>
+  <entry>
+    <title>New transformer release (mirror)</title>
+    <link rel="alternate" href="https://www.ailab.example.com/posts/transformer/"/>
+    <summary>Same article as the lab blog.</summary>
+    <published>{recent_iso}</published>
+  </entry>
+</feed>
+"""
+
+def render_fixtures():
+    now = datetime.utcnow().replace(microsecond=0)
+    rfc822 = lambda dt: format_datetime(dt.replace(tzinfo=timezone.utc))
+    values = {
+        'newest_iso': (now - timedelta(minutes=5)).isoformat() + 'Z',
+        'recent_iso': (now - timedelta(hours=1)).isoformat() + 'Z',
+        'recent_rfc822': rfc822(now - timedelta(hours=1)),
+        'older_rfc822': rfc822(now - timedelta(hours=3)),
+        'stale_rfc822': rfc822(now - timedelta(days=3)),
+    }
+    return {
+        '/lab.rss': RSS_FEED.format(**values).encode('utf-8'),
+        '/research.atom': ATOM_FEED.format(**values).encode('utf-8'),
+    }
+
+def start_feed_server(fixtures, delay=0.0):
+    """Serve fixture feeds; /feed/<n>.rss serves the RSS fixture under a distinct link per feed"""
+
+    class FeedHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            time.sleep(delay)
+            if self.path.startswith('/feed/'):
+                n = self.path.split('/')[-1].split('.')[0]
+                body = fixtures['/lab.rss'].replace(b'/posts/', f'/feed{n}/posts/'.encode())
+            else:
+                body = fixtures.get(self.path)
+            if body is None:
+                self.send_response(500)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/xml')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+def test_news_sources():
+    """RSS and Atom feeds are fetched concurrently, parsed and merged into one deduplicated stream"""
+    from news_sources import IngestionEngine, FeedSource
+
+    print("🧪 Testing multi-source ingestion")
+    print("=" * 60)
+
+    server, base = start_feed_server(render_fixtures())
+    try:
+        engine = IngestionEngine([
+            FeedSource(f'{base}/lab.rss'),
+            FeedSource(f'{base}/research.atom'),
+            FeedSource(f'{base}/missing.rss'),
+        ])
+        articles = engine.fetch_all()
+
+        urls = [article['url'] for article in articles]
+        assert urls == [
+            'https://research.example.org/diffusion-proteins',
+            'https://ailab.example.com/posts/transformer?utm_source=rss',
+            'https://ailab.example.com/posts/grasping',
+        ], urls
+
+        transformer = articles[1]
+        assert transformer['title'] == 'New transformer release'
+        assert transformer['description'] == 'A faster transformer for long documents.'
+        assert transformer['source'] == 'AI Lab Blog'
+        assert articles[0]['source'] == 'Research Digest'
+        assert all(article['published_at'].endswith('Z') for article in articles)
+
+        # A broken feed or a malformed link is reported without affecting the others
+        assert engine.stats[f'{base}/missing.rss']['error']
+        assert engine.stats[f'{base}/lab.rss']['articles'] == 3
+        print("✅ RSS/Atom parsing, age cut-off, deduplication and error isolation")
+    finally:
+        server.shutdown()
+
+    # Hundreds of slow feeds complete in a fraction of the serial time
+    feeds, delay = 200, 0.05
+    server, base = start_feed_server(render_fixtures(), delay=delay)
+    try:
+        engine = IngestionEngine([FeedSource(f'{base}/feed/{n}.rss') for n in range(feeds)], concurrency=32)
+        started = time.monotonic()
+        articles = engine.fetch_all()
+        elapsed = time.monotonic() - started
+        assert len(articles) == feeds * 2  # The malformed link in each feed is skipped
+        assert not any(stats['error'] for stats in engine.stats.values())
+        print(f"📊 {feeds} feeds in {elapsed:.2f}s (serial would be ≥ {feeds * delay:.1f}s)")
+        assert elapsed < feeds * delay / 2
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    test_news_sources()
@@ -0,0 +1,76 @@
+# test_query_counts.py
+import os
+import tempfile
+from contextlib import contextmanager
+from sqlalchemy import event
+
+def create_test_app():
+    """App bound to a throwaway SQLite database"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'queries.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    try:
+        from app import create_app
+        return create_app()
+    finally:
+        os.environ.pop('DATABASE_URL')
+
+@contextmanager
+def count_queries(engine):
+    """Count SQL statements executed on the engine inside the block"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def seed(db, users=30):
+    """Topics plus users that each follow every topic"""
+    from models import User, UserPreference, initialize_default_topics, Topic
+
+    initialize_default_topics()
+    topics = Topic.query.all()
+    for i in range(users):
+        user = User(email=f'reader{i}@example.com')
+        db.session.add(user)
+        db.session.flush()
+        for priority, topic in enumerate(topics, 1):
+            db.session.add(UserPreference(user_id=user.id, topic_id=topic.id, priority=priority % 3 + 1))
+    db.session.commit()
+    return topics
+
+def test_api_query_counts():
+    """API endpoints issue a fixed number of queries regardless of data size"""
+    app = create_test_app()
+    from app import db
+
+    with app.app_context():
+        print("🧪 Checking query counts per API endpoint")
+        print("=" * 60)
+
+        topics = seed(db)
+        client = app.test_client()
+
+        with count_queries(db.engine) as statements:
+            response = client.get('/api/topics')
+        data = response.get_json()
+        assert response.status_code == 200
+        assert all(topic['subscriber_count'] == 30 for topic in data['topics'])
+        print(f"📊 /api/topics: {len(statements)} queries for {len(topics)} topics")
+        assert len(statements) <= 2
+
+        with count_queries(db.engine) as statements:
+            response = client.get('/api/user/reader0@example.com')
+        data = response.get_json()
+        assert response.status_code == 200
+        assert len(data['user']['preferences']) == len(topics)
+        assert all(pref['topic_name'] for pref in data['user']['preferences'])
+        print(f"📊 /api/user/<email>: {len(statements)} queries for {len(topics)} preferences")
+        assert len(statements) <= 3
+
+if __name__ == '__main__':
+    test_api_query_counts()
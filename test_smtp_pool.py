@@ -0,0 +1,99 @@
+# test_smtp_pool.py
+from app import create_app, mail
+from email_service import PooledEmailSender, build_news_email
+import socketserver
+import threading
+
+class LocalSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept messages, counting sessions and deliveries"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.sessions += 1
+        self.reply('220 localhost test SMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                self.reply('250 Queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), LocalSMTPHandler)
+        self.lock = threading.Lock()
+        self.sessions = 0
+        self.messages = 0
+
+def test_smtp_pool(recipients=60):
+    """Messages share a few persistent SMTP sessions, recycled at the per-connection cap"""
+    server = LocalSMTPServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    app = create_app()
+    app.config.update(
+        MAIL_SERVER='127.0.0.1',
+        MAIL_PORT=server.server_address[1],
+        MAIL_USE_TLS=False,
+        MAIL_USERNAME='digest@example.com',
+        MAIL_PASSWORD=None,
+        MAIL_DEBUG=False
+    )
+    mail.init_app(app)
+
+    try:
+        with app.test_request_context():
+            print("🧪 Testing pooled SMTP delivery against a local server")
+            print("=" * 60)
+
+            articles = [{
+                'title': 'Pooled SMTP Delivery Test',
+                'url': 'https://example.com/pool-test',
+                'description': 'Checks that digests share persistent SMTP connections.',
+                'summary': '• Messages are spread over a few long-lived sessions',
+                'source': 'AI News Daily'
+            }]
+
+            sender = PooledEmailSender(app, connections=3, max_per_connection=10).start()
+            futures = [
+                sender.submit(build_news_email(f'reader{i}@example.com', articles))
+                for i in range(recipients)
+            ]
+            stats = sender.close()
+
+            assert all(future.result() for future in futures)
+            assert stats['sent'] == recipients and stats['failed'] == 0
+            assert server.messages == recipients
+            # Each connection opens once plus once per 10 messages it recycles
+            assert server.sessions <= recipients // 10 + 3
+
+            print(f"📊 {stats['sent']} messages over {server.sessions} SMTP sessions")
+            print(f"   ⚡ {stats['messages_per_second']} msg/s with {stats['connections']} connections")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == '__main__':
+    test_smtp_pool(recipients=1000)
@@ -0,0 +1,30 @@
+# test_topic_classifier.py
+from topic_classifier import TopicClassifier
+
+def test_topic_classifier():
+    """Keyword hits are weighted by field, and Unicode case variants still map to their topic"""
+    print("🧪 Testing topic classifier")
+    print("=" * 60)
+
+    classifier = TopicClassifier([
+        (1, 'Artificial Intelligence', 'ai, machine learning'),
+        (2, 'Robotics', 'robot, robotics')
+    ])
+
+    topic_id, topic_name, relevance, scores = classifier.classify({
+        'title': 'Machine learning powers a new robot',
+        'description': 'Researchers combine machine learning and robotics'
+    })
+    assert scores == {1: 5.0, 2: 5.0}
+    assert (topic_id, topic_name, relevance) == (1, 'Artificial Intelligence', 5.0)
+
+    # 'İ' matches 'i' case-insensitively, but 'Aİ'.lower() is not 'ai'
+    topic_id, _, relevance, _ = classifier.classify({'title': 'Yeni Aİ modeli tanıtıldı', 'description': 'Türkiye'})
+    assert topic_id == 1 and relevance == 3.0
+
+    assert classifier.classify({'title': 'Quarterly earnings', 'description': ''})[0] is None
+
+    print("✅ Topic classifier test passed")
+
+if __name__ == '__main__':
+    test_topic_classifier()
@@ -0,0 +1,88 @@
+# timezones.py - Per-tick timezone table shared by every user in a zone
+import threading
+import pytz
+from datetime import datetime, timedelta
+
+DEFAULT_TIMEZONE = 'Asia/Kolkata'
+MEMO_LIMIT = 10000  # Outside scheduler ticks nothing resets the memos, so keep them bounded
+
+class ZoneTable:
+    """Resolved pytz zones plus per-tick memos of local dates and send slots.
+
+    Subscribers share a handful of zones, so each zone is resolved once per
+    process and each (zone, instant) local date once per tick. An unknown zone
+    falls back to the default and is reported once per tick, not per user.
+    """
+
+    def __init__(self, default=DEFAULT_TIMEZONE):
+        self.default = default
+        self._lock = threading.Lock()
+        self._zones = {}
+        self._invalid = set()
+        self._local_dates = {}
+        self._slots = {}
+        self._reported = set()
+
+    def start_tick(self):
+        """Forget per-tick memos and allow invalid zones to be reported again"""
+        with self._lock:
+            self._local_dates.clear()
+            self._slots.clear()
+            self._reported.clear()
+
+    def zone(self, name):
+        """Resolved zone for a name, falling back to the default for unknown names"""
+        name = name or self.default
+        zone = self._zones.get(name)
+        if zone is None:
+            try:
+                zone = pytz.timezone(name)
+            except pytz.UnknownTimeZoneError:
+                zone = pytz.timezone(self.default)
+                with self._lock:
+                    self._invalid.add(name)
+            with self._lock:
+                self._zones[name] = zone
+        if name in self._invalid and name not in self._reported:
+            with self._lock:
+                self._reported.add(name)
+            print(f"⚠️  Unknown timezone '{name}', using {self.default}")
+        return zone
+
+    def local_date(self, name, utc_instant):
+        """Local calendar date of a naive UTC instant in the named zone"""
+        key = (name, utc_instant)
+        local_date = self._local_dates.get(key)
+        if local_date is None:
+            local_date = pytz.UTC.localize(utc_instant).astimezone(self.zone(name)).date()
+            self._remember(self._local_dates, key, local_date)
+        return local_date
+
+    def next_slot(self, name, preferred_time, after, earliest_date=None):
+        """First UTC instant after `after` at preferred_time local, on or after earliest_date"""
+        key = (name, preferred_time, after, earliest_date)
+        slot = self._slots.get(key)
+        if slot is not None:
+            return slot
+
+        zone = self.zone(name)
+        local_date = self.local_date(name, after)
+        if earliest_date:
+            local_date = max(local_date, earliest_date)
+        while True:
+            local_slot = zone.localize(datetime.combine(local_date, preferred_time))
+            slot = local_slot.astimezone(pytz.UTC).replace(tzinfo=None)
+            if slot > after:
+                break
+            local_date += timedelta(days=1)
+
+        self._remember(self._slots, key, slot)
+        return slot
+
+    def _remember(self, memo, key, value):
+        with self._lock:
+            if len(memo) >= MEMO_LIMIT:
+                memo.clear()
+            memo[key] = value
+
+zone_table = ZoneTable()
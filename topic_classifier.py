@@ -0,0 +1,88 @@
+# topic_classifier.py - Keyword-indexed topic classification for news articles
+import re
+import threading
+
+# Matches in the title count more than in the description, which count more than body text
+FIELD_WEIGHTS = (('title', 3.0), ('description', 2.0), ('full_text', 1.0))
+
+class TopicClassifier:
+    """All active topics' keywords compiled into one case-insensitive regex.
+
+    A single finditer pass over each article field scores every topic at once,
+    so classification costs O(text length) regardless of how many topics or
+    keywords there are.
+    """
+
+    def __init__(self, topics):
+        self.topic_names = {}
+        self.keyword_topics = {}
+        for topic_id, name, keywords in topics:
+            self.topic_names[topic_id] = name
+            for keyword in (keywords or '').split(','):
+                keyword = keyword.strip().lower()
+                if keyword:
+                    self.keyword_topics.setdefault(keyword, set()).add(topic_id)
+
+        self.pattern = None
+        self.group_topics = []
+        if self.keyword_topics:
+            # Longest first so 'machine learning' wins over a shorter overlapping keyword
+            alternatives = sorted(self.keyword_topics, key=len, reverse=True)
+            # One group per keyword: IGNORECASE matches Unicode case variants whose
+            # .lower() is not the keyword, so map matches back by group index
+            self.group_topics = [self.keyword_topics[keyword] for keyword in alternatives]
+            self.pattern = re.compile(
+                r'\b(?:' + '|'.join(f'({re.escape(keyword)})' for keyword in alternatives) + r')\b',
+                re.IGNORECASE
+            )
+
+    def score(self, article):
+        """Weighted keyword hits per topic id for one article dict"""
+        scores = {}
+        if not self.pattern:
+            return scores
+        for field, weight in FIELD_WEIGHTS:
+            text = article.get(field)
+            if not text:
+                continue
+            for match in self.pattern.finditer(text):
+                for topic_id in self.group_topics[match.lastindex - 1]:
+                    scores[topic_id] = scores.get(topic_id, 0.0) + weight
+        return scores
+
+    def classify(self, article):
+        """Best topic for an article: (topic_id, topic_name, relevance_score, all topic scores)"""
+        scores = self.score(article)
+        if not scores:
+            return None, None, 0.0, scores
+        topic_id = max(scores, key=lambda candidate: (scores[candidate], -candidate))
+        return topic_id, self.topic_names[topic_id], scores[topic_id], scores
+
+_classifier = None
+_classifier_fingerprint = None
+_classifier_lock = threading.Lock()
+
+def get_topic_classifier():
+    """Classifier for the current active topics, recompiled only when topics change"""
+    global _classifier, _classifier_fingerprint
+    from models import Topic
+    from app import db
+
+    topics = tuple(db.session.query(Topic.id, Topic.name, Topic.keywords)
+                   .filter(Topic.is_active == True).order_by(Topic.id).all())
+    with _classifier_lock:
+        if _classifier is None or topics != _classifier_fingerprint:
+            _classifier = TopicClassifier(topics)
+            _classifier_fingerprint = topics
+            print(f"🏷️  Topic classifier compiled ({len(topics)} topics, {len(_classifier.keyword_topics)} keywords)")
+        return _classifier
+
+def classify_articles(articles):
+    """Set topic_id, topic_name and relevance_score on article dicts in place"""
+    classifier = get_topic_classifier()
+    for article in articles:
+        topic_id, topic_name, relevance_score, _ = classifier.classify(article)
+        article['topic_id'] = topic_id
+        article['topic_name'] = topic_name
+        article['relevance_score'] = relevance_score
+    return articles